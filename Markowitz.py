@@ -16,38 +16,180 @@
 
 # Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
 
+from collections import OrderedDict
+from time import perf_counter
 from typing import List, Tuple
 
 import numpy as np
-import pandas as pd
 
 from config import NUM_PORTFOLIOS
 from helpers import Asset, getRiskFreeRate
 
+BATCH_SIZE = 2 ** 18 # Random portfolios scored at once, bounds memory use
+
+
+class OptimizerCache:
+    """Least recently used store of optimized weights, so identical asset selections
+        on the same data are only optimized once
+    """
+    def __init__(self, maxsize: int = 1024) -> None:
+        """Creates an empty cache
+
+        Args:
+            maxsize (int, optional): Entries kept before the least recently used is dropped. Defaults to 1024.
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        return
+    
+    def key(self, version, assets: List[Asset], method: str, *params) -> tuple:
+        """Builds the lookup key
+
+        Args:
+            version: Identifies the data the assets were built from, eg: backtest day
+            assets (List[Asset]): Selected assets
+            method (str): Optimization method
+            *params: Anything else the weights depend on, eg: risk free rate
+
+        Returns:
+            tuple: Key
+        """
+        return (version, frozenset(asset.ticker for asset in assets), method) + params
+    
+    def get(self, key: tuple) -> dict:
+        """Looks up weights
+
+        Args:
+            key (tuple): Key from key
+
+        Returns:
+            dict: Ticker: weight. None if not cached.
+        """
+        weights = self.entries.get(key)
+        if(weights is None):
+            self.misses += 1
+            return
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return weights
+    
+    def put(self, key: tuple, weights: dict) -> None:
+        """Stores weights
+
+        Args:
+            key (tuple): Key from key
+            weights (dict): Ticker: weight
+        """
+        self.entries[key] = weights
+        self.entries.move_to_end(key)
+        if(len(self.entries) > self.maxsize): self.entries.popitem(last=False)
+        return
+    
+    def stats(self) -> dict:
+        """Hit and miss counts
+
+        Returns:
+            dict: 'hits', 'misses', 'size' and 'hitRate'
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries),
+                'hitRate': self.hits / lookups if lookups else 0}
+
+class CovarianceAccumulator:
+    """Expanding covariance of a universe of series kept as running sums of
+        cross products, so any subset's covariance is a O(k^2) lookup
+    """
+    def __init__(self, symbols: List[str]) -> None:
+        """Creates an empty accumulator
+
+        Args:
+            symbols (List[str]): Symbol of each series, in the order observations are given
+        """
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.count = 0
+        self.mean = np.zeros(len(self.symbols))
+        self.m2 = np.zeros((len(self.symbols), len(self.symbols)))
+        return
+    
+    def update(self, observations: np.ndarray) -> None:
+        """Adds observations, merging their mean and cross products into the running
+            ones (Welford's update generalized to blocks)
+
+        Args:
+            observations (np.ndarray): Shape [symbols x new observations]
+        """
+        m = observations.shape[1]
+        if(m == 0): return
+        mean = observations.mean(axis=1)
+        centered = observations - mean[:, None]
+        delta = mean - self.mean
+        total = self.count + m
+        
+        self.m2 += centered @ centered.T + np.outer(delta, delta) * (self.count * m / total)
+        self.mean += delta * (m / total)
+        self.count = total
+        return
+    
+    def covariance(self, symbols: List[str] = None) -> np.ndarray:
+        """Sample covariance of the observations so far
+
+        Args:
+            symbols (List[str], optional): Subset to return. Defaults to every symbol.
+
+        Returns:
+            np.ndarray: Covariance matrix in the order of symbols
+        """
+        if(symbols is None): return self.m2 / (self.count - 1)
+        rows = [self.index[symbol] for symbol in symbols]
+        return self.m2[np.ix_(rows, rows)] / (self.count - 1)
 
 class EfficientFrontier:
-    def __init__(self, assets: List[Asset]) -> None:
+    def __init__(self, assets: List[Asset], rfr: float = None, covariance: CovarianceAccumulator = None) -> None:
         """Determines efficient portfolio weights
 
         Args:
             assets (List[Asset]): list of assets with data
+            rfr (float, optional): Risk free rate. Defaults to the latest from getRiskFreeRate.
+            covariance (CovarianceAccumulator, optional): Running covariance of the asset universe. Defaults to None,
+                                                           computed from the assets' prices.
         """
         self.assets = assets
+        self.rfr = getRiskFreeRate() if rfr is None else rfr
         self.n = len(self.assets)
         
         if(self.n > 1):
-            data = []
-            for asset in self.assets:
-                prices = asset.prices.pct_change()[1:].to_list()
-                data.append(prices)
-            
-            data = np.array(data)
-            self.covMat = np.cov(data)
+            if(covariance is None):
+                prices = np.vstack([np.asarray(asset.prices, dtype=np.float64) for asset in self.assets])
+                data = prices[:, 1:] / prices[:, :-1] - 1
+                self.covMat = np.cov(data)
+            else:
+                self.covMat = covariance.covariance([asset.ticker for asset in self.assets])
             self.covMat = self.covMat * 252
-            self.invSigma = np.linalg.inv(self.covMat)
+            self.chol = np.linalg.cholesky(self.covMat)
             self.one = np.ones(len(self.assets))
         return
     
+    def _solve(self, b: np.ndarray) -> np.ndarray:
+        """Solves $\\Sigma x = b$ with the Cholesky factor by forward then back substitution
+
+        Args:
+            b (np.ndarray): Right hand side
+
+        Returns:
+            np.ndarray: x
+        """
+        L = self.chol
+        y = np.empty(self.n)
+        for i in range(self.n):
+            y[i] = (b[i] - L[i, :i] @ y[:i]) / L[i, i]
+        x = np.empty(self.n)
+        for i in reversed(range(self.n)):
+            x[i] = (y[i] - L[i + 1:, i] @ x[i + 1:]) / L[i, i]
+        return x
+    
     def portfolioMean(self, weights: np.ndarray = None) -> float:
         """Mean of portfolio given weights
         
@@ -94,7 +236,7 @@ class EfficientFrontier:
         Returns:
             np.ndarray: Value
         """
-        return (np.matmul(np.matmul(self.one.T, self.invSigma), self.one))
+        return self.one @ self._solve(self.one)
     
     def _assignWeights(self, omega: np.ndarray) -> None:
         """Stores weights in asset object
@@ -128,7 +270,7 @@ class EfficientFrontier:
         Returns:
             float: Sharpe ratio
         """
-        return (self.portfolioMean(weights) - getRiskFreeRate()) / self.portfolioVariance(weights)
+        return (self.portfolioMean(weights) - self.rfr) / self.portfolioVariance(weights)
     
     def globalMinimumVarianceWeights(self) -> np.ndarray:
         """Finds the long short global minimum variance portfolio using Markowitz portfolio theory
@@ -139,15 +281,19 @@ class EfficientFrontier:
         insuff, weights = self._checkInsuffAssets()
         if(insuff): return weights
         
-        omega = np.matmul(self.invSigma, self.one)
-        omega = omega / self._optimizedDenominator()
+        omega = self._solve(self.one)
+        omega = omega / omega.sum()
         
         self._assignWeights(omega)
         
         return omega
     
-    def optimizeSharpeRatio(self) -> np.ndarray:
-        """Finds the long only portfolio allocation with the highest Sharpe ratio
+    def optimizeSharpeRatio(self, seed: int = None) -> np.ndarray:
+        """Finds the long only portfolio allocation with the highest Sharpe ratio out of
+            NUM_PORTFOLIOS random allocations. Allocations are drawn and scored in batches.
+
+        Args:
+            seed (int, optional): Random seed for reproducible weights. Defaults to None.
 
         Returns:
             np.ndarray: Asset weights
@@ -155,25 +301,117 @@ class EfficientFrontier:
         insuff, weights = self._checkInsuffAssets()
         if(insuff): return weights
         
-        rfr = getRiskFreeRate()
+        rfr = self.rfr
+        mu = self._getMu()
+        rng = np.random.default_rng(seed)
         
-        results = pd.DataFrame(columns=['Allocation', 'Variance', 'Return', 'Sharpe'])
-
-        for _ in range(NUM_PORTFOLIOS):
-            weights = np.random.random(self.n)
-            weights /= np.sum(weights)
-            ret = self.portfolioMean(weights)
-            var = self.portfolioVariance(weights)
+        bestSharpe = -np.inf
+        for start in range(0, NUM_PORTFOLIOS, BATCH_SIZE):
+            omega = rng.random((min(BATCH_SIZE, NUM_PORTFOLIOS - start), self.n))
+            omega /= omega.sum(axis=1, keepdims=True)
+            ret = omega @ mu
+            var = np.einsum('ij,ij->i', omega @ self.covMat, omega)
             shrp = (ret - rfr) / var
-            results = results.append({'Allocation': str(weights), 'Variance': var, 'Return': ret, 'Sharpe': shrp}, ignore_index=True)
+            
+            i = np.nanargmax(shrp)
+            if(shrp[i] > bestSharpe):
+                bestSharpe = shrp[i]
+                weights = omega[i]
         
-        i = results['Sharpe'].idxmax()
-        weights = results.iloc[i]['Allocation'].strip('[]').split()
-        weights = [float(i) for i in weights]
+        self._assignWeights(weights)
+        return weights
+    
+    def optimizeSharpeQP(self, tol: float = 1e-10) -> np.ndarray:
+        """Finds the long only tangency portfolio exactly. Solves
+            min y^T \\Sigma y subject to (\\mu - r_f)^T y = 1 and y >= 0 with a primal
+            active set method, then rescales y to sum to one. Unlike optimizeSharpeRatio
+            this maximizes excess return over volatility and is deterministic.
+
+        Args:
+            tol (float, optional): Optimality tolerance. Defaults to 1e-10.
+
+        Returns:
+            np.ndarray: Asset weights
+        """
+        insuff, weights = self._checkInsuffAssets()
+        if(insuff): return weights
+        
+        excess = self._getMu() - self.rfr
+        if(not (excess > 0).any()): # No tangency portfolio, hold the best single asset
+            weights = np.zeros(self.n)
+            weights[np.argmax(excess / np.sqrt(np.diag(self.covMat)))] = 1
+            self._assignWeights(weights)
+            return weights
+        
+        y = np.zeros(self.n)
+        free = np.zeros(self.n, dtype=bool)
+        first = np.argmax(excess)
+        y[first] = 1 / excess[first]
+        free[first] = True
+        
+        for _ in range(100 * self.n):
+            F = np.flatnonzero(free)
+            z = np.linalg.solve(self.covMat[np.ix_(F, F)], excess[F])
+            target = np.zeros(self.n)
+            target[F] = z / (excess[F] @ z)
+            step = target - y
+            
+            if(np.abs(step).max() <= tol * np.abs(y).max()):
+                grad = self.covMat @ y
+                lam = (grad[F] @ excess[F]) / (excess[F] @ excess[F])
+                bound = np.flatnonzero(~free)
+                multipliers = grad[bound] - lam * excess[bound]
+                if(bound.size == 0 or multipliers.min() >= -tol * np.abs(grad).max()): break
+                free[bound[np.argmin(multipliers)]] = True
+                continue
+            
+            alpha, blocking = 1, None
+            for i in F[step[F] < 0]:
+                if(-y[i] / step[i] < alpha):
+                    alpha, blocking = -y[i] / step[i], i
+            y += alpha * step
+            if(blocking is not None):
+                y[blocking] = 0
+                free[blocking] = False
         
+        weights = y / y.sum()
         self._assignWeights(weights)
         return weights
     
+    def tangencySharpe(self, weights: np.ndarray = None) -> float:
+        """Excess return over volatility, the objective of optimizeSharpeQP
+
+        Args:
+            weights (np.ndarray, optional): Asset weights. Defaults to current assigned values.
+
+        Returns:
+            float: Sharpe ratio
+        """
+        return (self.portfolioMean(weights) - self.rfr) / np.sqrt(self.portfolioVariance(weights))
+    
+    def benchmarkSharpe(self, seed: int = None) -> dict:
+        """Times optimizeSharpeRatio against optimizeSharpeQP and compares the Sharpe ratio
+            (excess return over volatility) of the weights they find. Leaves the QP weights assigned.
+
+        Args:
+            seed (int, optional): Random seed for the Monte Carlo search. Defaults to None.
+
+        Returns:
+            dict: Run time in seconds and Sharpe ratio of each method, and the Sharpe gap
+        """
+        start = perf_counter()
+        mc = self.optimizeSharpeRatio(seed)
+        mcTime = perf_counter() - start
+        
+        start = perf_counter()
+        qp = self.optimizeSharpeQP()
+        qpTime = perf_counter() - start
+        
+        mcSharpe = self.tangencySharpe(np.asarray(mc, dtype=float))
+        qpSharpe = self.tangencySharpe(np.asarray(qp, dtype=float))
+        return {'MonteCarloTime': mcTime, 'QPTime': qpTime, 'MonteCarloSharpe': mcSharpe,
+                'QPSharpe': qpSharpe, 'SharpeGap': qpSharpe - mcSharpe}
+    
     def _getMu(self) -> np.ndarray:
         """Gets average returns of assets
 
@@ -197,9 +435,10 @@ class EfficientFrontier:
         gm = self.globalMinimumVarianceWeights()
         mu = self._getMu()
         denom = self._optimizedDenominator()
-        omega = (1/gamma) * ((denom * np.matmul(self.invSigma, mu)
-                             - np.matmul(np.matmul(mu.T, self.invSigma), self.one)
-                             * np.matmul(self.invSigma, self.one))
+        invSigmaOne = self._solve(self.one)
+        omega = (1/gamma) * ((denom * self._solve(mu)
+                             - (mu @ invSigmaOne)
+                             * invSigmaOne)
                              / denom)
         
         omega += gm
@@ -16,38 +16,22 @@
 
 # Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
 
-import os, psutil
-from typing import List
+import argparse, os, psutil, sys
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Tuple
 
-from communicate import publish
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # Live modules
+
+import helpers
 from config import ACCOUNT_START, DIRECTORY
+from environment import BacktestClock, Environment, LocalStorage, MatrixQuotes
+from graphs import plotPortfolio
 from helpers import *
+from orders import InstantExecutor
 from trade import *
 
-class CurrentPositions:
-    def __init__(self, book: PositionTracker) -> None:
-        """Unnecessarily inefficient way to get backtest current share quantities
-
-        Args:
-            book (PositionTracker): Trades tested
-        """
-        self.current = {}
-        for _, row in book.trades.iterrows():
-            try:
-                self.current[row['Symbol']] += row['Quantity']
-            except KeyError:
-                self.current[row['Symbol']] = row['Quantity']
-        return
-    
-    def getCurrent(self) -> dict:
-        """Get holdings
-
-        Returns:
-            dict: Holdings
-        """
-        return self.current
-        
-
 def intToBinary(i: int) -> List[int]:
     """I have no clue why I implemented this in this weird way.
     It works though. Recursive backtracking or list comprehension would've been
@@ -67,7 +51,8 @@ def intToBinary(i: int) -> List[int]:
     return b
 
 def createAssets(rr: List[RelativeRotation], day: int) -> List[Asset]:
-    """Creates assets with data only up to the current day of the backtest
+    """Creates assets with data only up to the current day of the backtest.
+        Price data are views of each sector's closes, so a day costs O(sectors).
 
     Args:
         rr (List[RelativeRotation]): List of relative rotation objects per sector
@@ -76,23 +61,130 @@ def createAssets(rr: List[RelativeRotation], day: int) -> List[Asset]:
     Returns:
         List[Asset]: Assets as of backtest day
     """
-    assets = []
-    for sector in rr:
-        prices = sector.prices[:day]
-        market = sector.market[:day]
-        prices.reset_index(inplace=True, drop=True)
-        market.reset_index(inplace=True, drop=True)
+    return [sector.snapshot(day) for sector in rr]
+
+def batchAssets(rr: List[RelativeRotation], start: int, end: int) -> Iterator[Tuple[int, List[Asset], float]]:
+    """Assets of each backtest day indexed out of the precomputed relative rotation series
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+        start (int): First day of backtest
+        end (int): Day to stop before
+
+    Yields:
+        int: Day
+        List[Asset]: Assets as of the day
+        float: Seconds spent building them
+    """
+    for j in range(start, end):
+        begin = perf_counter()
+        assets = createAssets(rr, j)
+        yield j, assets, perf_counter() - begin
+
+def walkForwardAssets(rr: List[RelativeRotation], start: int, end: int, check: bool = False,
+                      tol: float = 1e-8) -> Iterator[Tuple[int, List[Asset], float]]:
+    """Assets of each backtest day from calculators fed one bar at a time, so a day's values
+        can only depend on closes up to that day. O(1) work per sector per day.
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector, for prices and settings
+        start (int): First day of backtest
+        end (int): Day to stop before
+        check (bool, optional): Compare every day with the precomputed series. Defaults to False.
+        tol (float, optional): Allowed relative difference when checking. Defaults to 1e-8.
+
+    Raises:
+        ValueError: If checking and a precomputed value differs from the causal one
+
+    Yields:
+        int: Day
+        List[Asset]: Assets as of the day
+        float: Seconds spent updating the calculators and building the assets
+    """
+    calculators = [StreamingRelativeRotation(x.ticker, x.period, x.smoothing, x.change) for x in rr]
+    closes = [x.prices.to_numpy() for x in rr]
+    market = rr[0].market.to_numpy()
+    
+    for j in range(end):
+        begin = perf_counter()
+        values = [calculator.update(close[j], market[j]) for calculator, close in zip(calculators, closes)]
+        if(j < start): continue
+        
+        assets = []
+        for sector, close, (relativeStrength, momentum) in zip(rr, closes, values):
+            assets.append(Asset(ticker = sector.ticker,
+                                relativeStrength = relativeStrength,
+                                momentum = momentum,
+                                closes = close,
+                                day = j + 1,
+                                lastPrice = close[j]))
+        seconds = perf_counter() - begin
         
-        assets.append(Asset(
-            ticker = sector.ticker,
-            relativeStrength = sector.relativeStrength[day],
-            momentum = sector.momentum[day],
-            prices = prices,
-            lastPrice = sector.prices[day],
-            market = market
-        ))
+        if(check):
+            for sector, (relativeStrength, momentum) in zip(rr, values):
+                if(not np.allclose([sector.relativeStrength[j], sector.momentum[j]], [relativeStrength, momentum],
+                                   rtol=tol, atol=0, equal_nan=True)):
+                    raise ValueError('Precomputed relative rotation of ' + sector.ticker + ' differs from the causal value on day ' + str(j))
+        yield j, assets, seconds
+
+def configurationMasks(rr: List[RelativeRotation], configurations: List[int]) -> Dict[int, np.ndarray]:
+    """Sectors each quadrant configuration selects on every day, from the precomputed series
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+        configurations (List[int]): Quadrant configurations, see intToBinary
+
+    Returns:
+        Dict[int, np.ndarray]: Configuration: mask, shape [sectors x days]
+    """
+    quadrants = quadrantMatrix(np.vstack([x.relativeStrength.to_numpy() for x in rr]),
+                               np.vstack([x.momentum.to_numpy() for x in rr]))
+    return {i: selectionMask(quadrants, intToBinary(i)) for i in configurations}
+
+def optimizedPortfolios(rr: List[RelativeRotation], selections: dict, start: int, end: int, dates: List[str] = None,
+                        days: Iterator[Tuple[int, List[Asset], float]] = None, cache: OptimizerCache = None,
+                        pending: Callable[[object, int], bool] = None) -> Iterator[Tuple[int, dict, float]]:
+    """Optimizes the portfolio of every selection on every backtest day. The one daily loop
+        shared by runBacktest, the fast path and the sweep: the covariance is fed the returns
+        up to the day, the rate is looked up once and the Monte Carlo draws are seeded by
+        the day so every path gets the same weights.
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+        selections (dict): Key: sectors to include, either a mask of shape [sectors x days] or a
+                            quadrant configuration applied to each day's asset quadrants, eg: [0, 0, 1, 1]
+        start (int): First day of backtest
+        end (int): Day to stop before
+        dates (List[str], optional): Date of each day, used to look up the risk free rate. Defaults to None, latest rate.
+        days (Iterator[Tuple[int, List[Asset], float]], optional): Each day's assets, eg: walkForwardAssets.
+                                                                   Defaults to None, batchAssets.
+        cache (OptimizerCache, optional): Shared weight cache. Defaults to None, a new one.
+        pending (Callable[[object, int], bool], optional): If a key still needs a day. Defaults to None, every day.
+
+    Yields:
+        int: Day
+        dict: Key: all assets with weights assigned, for the keys still pending
+        float: Seconds spent building the day's assets
+    """
+    closes = np.vstack([sector.prices.to_numpy() for sector in rr])
+    returns = closes[:, 1:] / closes[:, :-1] - 1
+    covariance = CovarianceAccumulator([sector.ticker for sector in rr])
+    cache = OptimizerCache() if cache is None else cache
     
-    return assets
+    for j, dayAssets, seconds in (batchAssets(rr, start, end) if days is None else days):
+        covariance.update(returns[:, covariance.count:j]) # Assets hold the closes up to day j
+        rfr = getRiskFreeRate(None if dates is None else dates[j])
+        quadrants = np.array([x.quadrant for x in dayAssets])
+        
+        portfolios = {}
+        for key, selection in selections.items():
+            if(pending is not None and not pending(key, j)): continue
+            assets = [copy(x) for x in dayAssets] # weights are assigned per selection
+            selected = selection[:, j] if isinstance(selection, np.ndarray) else selectionMask(quadrants, selection)
+            portfolio = [x for x, include in zip(assets, selected) if include]
+            portfolios[key] = optimizeWeights(portfolio, assets, rfr, covariance, cache, j, j)
+        yield j, portfolios, seconds
+    return
 
 def mem():
     """Checker to ensure program won't exceed EC2 memory limits
@@ -101,50 +193,189 @@ def mem():
     if(memory > (1/3)): print('RAM use exceeded value, currently at ' + str(memory) + ' GB.')
     return
 
-"""
-This should be implemented so daily assets are only created once and the quadrants loop
-    is run within that. Basically, the nested loops should be inverted. Inside loop should be outside
-    and outside loop should be inside.
+def quoteMatrix(rr: List[RelativeRotation], dates: List[str] = None) -> PriceMatrix:
+    """Closes of every sector and the market, read by the backtest's MatrixQuotes
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+        dates (List[str], optional): Date of each day. Defaults to None, days are numbered.
+
+    Returns:
+        PriceMatrix: Sectors in the order of rr, then MARKET_INDEX
+    """
+    values = np.vstack([sector.prices.to_numpy() for sector in rr] + [rr[0].market.to_numpy()])
+    days = np.arange(values.shape[1]) if dates is None else pd.to_datetime(dates).to_numpy()
+    return PriceMatrix([sector.ticker for sector in rr] + [MARKET_INDEX], days, values)
+
+def runBacktest(rr: List[RelativeRotation], configurations: List[int], start: int = 170, end: int = 2517,
+                checkpoint: int = 0, verify: bool = False, dates: List[str] = None, walkForward: bool = False,
+                timing: str = None) -> dict:
+    """Runs the quadrant configurations side by side through the live position tracking
+        and trade functions. Each day's assets are created once and every configuration
+        advances its own book against them. Books are kept in memory and only written to
+        disk at checkpoints and at the end, so an interrupted run resumes after the last
+        day found in the files.
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+        configurations (List[int]): Quadrant configurations, see intToBinary
+        start (int, optional): First day of backtest. Defaults to 170.
+        end (int, optional): Day to stop before. Defaults to 2517.
+        checkpoint (int, optional): Days between writing the books to disk. Defaults to 0, only at the end.
+        verify (bool, optional): Check running holdings against the trade log every day. Defaults to False.
+        dates (List[str], optional): Date of each day, used to look up the risk free rate. Defaults to None, latest rate.
+        walkForward (bool, optional): Build each day's assets by streaming bars through StreamingRelativeRotation
+                                       instead of indexing the precomputed series. With verify every day is
+                                       checked against the precomputed series. Defaults to False.
+        timing (str, optional): Csv to write the seconds spent building each day's assets. Defaults to None.
+
+    Returns:
+        dict: Quadrants: profit
+    """
+    saveDirs = {}
+    for i in configurations:
+        saveDirs[i] = DIRECTORY + str(i) + '/'
+    
+    clock = BacktestClock(start)
+    quotes = MatrixQuotes(quoteMatrix(rr, dates), clock)
+    tickers = [sector.ticker for sector in rr]
+    books = {}
+    for i in configurations:
+        env = Environment(clock, quotes, None, LocalStorage(saveDirs[i]), tickers)
+        books[i] = PositionTracker(env, verify)
+        env.venue = InstantExecutor(quotes, books[i].getHoldings())
+    cache = OptimizerCache()
+    if(walkForward):
+        selections = {i: intToBinary(i) for i in configurations}
+        days = walkForwardAssets(rr, start, end, verify)
+    else:
+        selections = configurationMasks(rr, configurations)
+        days = batchAssets(rr, start, end)
+    pending = lambda i, j: int(books[i].lastDate()) < j # Days before are in the files from an earlier run
+    
+    seconds = []
+    for j, portfolios, elapsed in optimizedPortfolios(rr, selections, start, end, dates, days, cache, pending):
+        seconds.append(elapsed) # 160 is the first non NaN value. (period * 2 + smoothing + change)
+        clock.advance(j)
+        for i, assets in portfolios.items():
+            book = books[i]
+            if(j != start and ((j - start) % 252) == 0): book.changeAllocation(1000)
+            deltaPositions = calculatePositions(book.env, book, assets)
+            filled, price, _ = rebalance(book.env, deltaPositions)
+            logTrades(book.env, book, filled, price)
+            if(checkpoint and (j - start + 1) % checkpoint == 0): book.saveLogs()
+        mem()
+    
+    print('Optimizer cache: ' + str(cache.stats()))
+    print(('Walk forward' if walkForward else 'Batch') + ' assets: ' + str(sum(seconds)) + ' s total, '
+          + str(1000 * sum(seconds) / max(len(seconds), 1)) + ' ms per day')
+    if(timing): pd.DataFrame({'Day': range(start, start + len(seconds)), 'Seconds': seconds}).to_csv(timing, index=False)
     
-This should cut down backtesting run time significantly.
+    profit = {}
+    for i in configurations:
+        books[i].saveLogs()
+        plotPortfolio(books[i].tracker, saveDirs[i])
+        profit[str(intToBinary(i))] = books[i].getStrategyValue() - ACCOUNT_START
+    return profit
 
-Additionally, the days of the backtest should be automatically generated so that the asset list
-    in consideration can be easily changed without having to worry about the length of price history data.
+def _initWorker(relativeRotations: List[RelativeRotation], dates: List[str], rates: RiskFreeRate) -> None:
+    """Stores the read only relative rotation data once per worker process
+
+    Args:
+        relativeRotations (List[RelativeRotation]): List of relative rotation objects per sector
+        dates (List[str]): Date of each day
+        rates (RiskFreeRate): Rates loaded by the parent, so workers never touch the cache file
+    """
+    global sharedRR, sharedDates
+    sharedRR = relativeRotations
+    sharedDates = dates
+    helpers.riskFree = rates
+    return
+
+def _runConfigurations(configurations: List[int], start: int, end: int, checkpoint: int, verify: bool,
+                       walkForward: bool) -> dict:
+    """Worker entry point, runs a group of configurations against the shared data
 
-I'll implement these at some point, currently not worth the effort as running this backtest "only" takes 4 to 5 days
-    and there are other things I should be doing instead.
+    Args:
+        configurations (List[int]): Quadrant configurations, see intToBinary
+        start (int): First day of backtest
+        end (int): Day to stop before
+        checkpoint (int): Days between writing the books to disk
+        verify (bool): Check running holdings against the trade log
+        walkForward (bool): Stream bars through StreamingRelativeRotation
+
+    Returns:
+        dict: Quadrants: profit
+    """
+    return runBacktest(sharedRR, configurations, start, end, checkpoint, verify, sharedDates, walkForward)
+
+def runParallel(rr: List[RelativeRotation], configurations: List[int], workers: int,
+                start: int = 170, end: int = 2517, checkpoint: int = 0, verify: bool = False,
+                dates: List[str] = None, walkForward: bool = False, timing: str = None) -> dict:
+    """Spreads the quadrant configurations over a process pool. Each worker still shares
+        its daily assets between the configurations it was given.
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+        configurations (List[int]): Quadrant configurations, see intToBinary
+        workers (int): Number of processes
+        start (int, optional): First day of backtest. Defaults to 170.
+        end (int, optional): Day to stop before. Defaults to 2517.
+        checkpoint (int, optional): Days between writing the books to disk. Defaults to 0, only at the end.
+        verify (bool, optional): Check running holdings against the trade log every day. Defaults to False.
+        dates (List[str], optional): Date of each day, used to look up the risk free rate. Defaults to None, latest rate.
+        walkForward (bool, optional): Stream bars through StreamingRelativeRotation, see runBacktest. Defaults to False.
+        timing (str, optional): Csv for per day asset timing, only written when running in this process. Defaults to None.
+
+    Returns:
+        dict: Quadrants: profit, in the order of configurations
+    """
+    if(workers <= 1): return runBacktest(rr, configurations, start, end, checkpoint, verify, dates, walkForward, timing)
+    
+    groups = [configurations[k::workers] for k in range(workers)]
+    groups = [x for x in groups if x]
+    
+    getRiskFreeRate() # Load or refresh the rate cache once before the workers start
+    results = {}
+    with ProcessPoolExecutor(max_workers=len(groups), initializer=_initWorker,
+                             initargs=(rr, dates, helpers.riskFree)) as pool:
+        n = len(groups)
+        for result in pool.map(_runConfigurations, groups, [start] * n, [end] * n, [checkpoint] * n, [verify] * n,
+                               [walkForward] * n):
+            results.update(result)
+    
+    profit = {}
+    for i in configurations:
+        profit[str(intToBinary(i))] = results[str(intToBinary(i))]
+    return profit
+
+"""
+The days of the backtest should be automatically generated so that the asset list
+    in consideration can be easily changed without having to worry about the length of price history data.
 """
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backtest every quadrant configuration')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes to spread configurations over')
+    parser.add_argument('--start', type=int, default=170, help='First day of backtest')
+    parser.add_argument('--end', type=int, default=2517, help='Day to stop before')
+    parser.add_argument('--checkpoint', type=int, default=0, help='Days between saving progress, 0 to only save at the end')
+    parser.add_argument('--verify', action='store_true', help='Cross check running holdings against a full trade log replay')
+    parser.add_argument('--fast', action='store_true', help='Simulate with array arithmetic instead of the full trade path, writes no files')
+    parser.add_argument('--check', action='store_true', help='With --fast, compare against the files of an earlier full run')
+    parser.add_argument('--walk-forward', action='store_true', help='Feed bars one at a time through the streaming RS calculator, with --verify check causality')
+    parser.add_argument('--timing', default=None, help='Csv to write the per day asset building time')
+    args = parser.parse_args()
+    
     TDSession = authenticateAPI()
-    setup = SetupRR(TDSession)
+    setup = SetupRR(TDSession, appendQuotes=False)
     rr = setup.getRR()
     mem()
-    profit = {}
-    for i in range(1, 16):
-        saveDir = DIRECTORY + str(i) + '/'
-        try:
-            os.mkdir(saveDir[:-1])
-        except FileExistsError:
-            pass
-        
-        quadrants = intToBinary(i)
-        for j in range(170, 2517): # 160 is the first non NaN value. (period * 2 + smoothing + change)
-            assets = createAssets(rr, j)
-            portfolio = [x for x in assets if quadrants[x.quadrant - 1]]
-            assets = optimizeWeights(portfolio, assets)
-            mem()
-            book = PositionTracker(TDSession, j, assets, saveDir)
-            if(j != 170 and ((j - 170) % 252) == 0): book.changeAllocation(1000)
-            deltaPositions = calculatePositions(TDSession, book, assets)
-            price = rebalance(TDSession, deltaPositions, assets)
-            mem()
-            logTrades(TDSession, book, deltaPositions, price, j, assets)
-            book.saveLogs(saveDir)
-        
-        publish(book, saveDir)
-        profit[str(quadrants)] = book.getStrategyValue() - ACCOUNT_START
-        #print(book.getStrategyValue() - ACCOUNT_START)
-        mem()
+    if(args.fast):
+        from simulate import runFast
+        profit = runFast(rr, list(range(1, 16)), args.start, args.end, setup.dates, args.check)
+    else:
+        profit = runParallel(rr, list(range(1, 16)), args.workers, args.start, args.end, args.checkpoint, args.verify,
+                             setup.dates, args.walk_forward, args.timing)
 
     print(profit)
     print(max(profit, key = profit.get))
@@ -0,0 +1,167 @@
+# Relative Rotation Swing Trading Algorithm
+# Copyright (C) 2022  Shaurya Tathgir
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from backtest import configurationMasks, intToBinary, optimizedPortfolios
+from config import ACCOUNT_START, DIRECTORY, POSITIONS, TRACKER
+from helpers import Asset, RelativeRotation
+
+
+def weightMatrices(rr: List[RelativeRotation], configurations: List[int], start: int = 170, end: int = 2517,
+                   dates: List[str] = None) -> dict:
+    """Optimizes every configuration's portfolio for every day, the same way runBacktest does
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+        configurations (List[int]): Quadrant configurations, see intToBinary
+        start (int, optional): First day of backtest. Defaults to 170.
+        end (int, optional): Day to stop before. Defaults to 2517.
+        dates (List[str], optional): Date of each day, used to look up the risk free rate. Defaults to None, latest rate.
+
+    Returns:
+        dict: Configuration: weights, shape [days x sectors] in the order of rr
+    """
+    weights = {i: np.zeros((end - start, len(rr))) for i in configurations}
+    for j, portfolios, _ in optimizedPortfolios(rr, configurationMasks(rr, configurations), start, end, dates):
+        for i, assets in portfolios.items():
+            weights[i][j - start] = weightRow(assets, rr)
+    return weights
+
+def weightRow(assets: List[Asset], rr: List[RelativeRotation]) -> np.ndarray:
+    """Weights of optimized assets in the order of the sectors
+
+    Args:
+        assets (List[Asset]): Assets with weights assigned, in any order
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+
+    Returns:
+        np.ndarray: Weight of each sector
+    """
+    weights = {x.ticker: x.weight for x in assets}
+    return np.array([weights[sector.ticker] for sector in rr])
+
+def simulate(weights: np.ndarray, closes: np.ndarray, market: np.ndarray, start: int,
+             allocation: float = 1000, period: int = 252) -> dict:
+    """Rebalances a portfolio to the given weights day by day with array arithmetic. Follows
+        calculatePositions, rebalance and logTrades: share targets are truncated to whole
+        shares, trades fill at the day's price and the allocation grows every period days.
+
+    Args:
+        weights (np.ndarray): Target weights, shape [days x sectors]
+        closes (np.ndarray): Sector closes, shape [sectors x all days]
+        market (np.ndarray): Market index closes for all days
+        start (int): Day of the first row of weights
+        allocation (float, optional): Cash added every period. Defaults to 1000.
+        period (int, optional): Days between allocation increases. Defaults to 252.
+
+    Returns:
+        dict: Arrays with a row per day, starting the day before start. 'Date', 'Cash', 'Value',
+                'Benchmark' (tracker), 'Multiplier' (positions benchmark), 'Shares' and 'Values' [days x sectors]
+    """
+    days, n = weights.shape
+    cash = np.empty(days + 1)
+    value = np.empty(days + 1)
+    benchmark = np.empty(days + 1)
+    multiplier = np.empty(days + 1)
+    shares = np.zeros((days + 1, n))
+    values = np.zeros((days + 1, n))
+
+    cash[0] = value[0] = benchmark[0] = ACCOUNT_START
+    multiplier[0] = ACCOUNT_START / market[start]
+
+    for d in range(1, days + 1):
+        j = start + d - 1
+        price = closes[:, j]
+        held = shares[d - 1]
+
+        if(j != start and ((j - start) % period) == 0): # PositionTracker.changeAllocation on the previous row
+            strategy = cash[d - 1] + held @ price
+            cash[d - 1] += allocation
+            value[d - 1] = strategy + allocation
+            multiplier[d - 1] *= value[d - 1] / strategy
+
+        strategy = cash[d - 1] + held @ price
+        shares[d] = np.trunc(strategy * weights[d - 1] / price)
+        cash[d] = cash[d - 1] - (shares[d] - held) @ price
+        values[d] = shares[d] * price
+        value[d] = cash[d] + values[d].sum()
+        multiplier[d] = multiplier[d - 1]
+        benchmark[d] = market[j] * multiplier[d]
+
+    return {'Date': np.arange(start - 1, start + days), 'Cash': cash, 'Value': value, 'Benchmark': benchmark,
+            'Multiplier': multiplier, 'Shares': shares, 'Values': values}
+
+def compareWithFiles(result: dict, tickers: List[str], location: str) -> dict:
+    """Regression check of a simulation against the tracker and positions files
+        written by the full backtest
+
+    Args:
+        result (dict): Output of simulate
+        tickers (List[str]): Sector of each weight column
+        location (str): Folder with the files, eg: files/3/
+
+    Returns:
+        dict: Largest absolute difference in 'Tracker' and 'Positions', over the days in both
+    """
+    tracker = pd.read_csv(location + TRACKER)
+    positions = pd.read_csv(location + POSITIONS)
+    days = np.intersect1d(result['Date'], tracker['Date'].astype(int))
+    rows = days - result['Date'][0]
+    tracker = tracker.set_index(tracker['Date'].astype(int)).loc[days]
+    positions = positions.set_index(positions['Date'].astype(int)).loc[days]
+
+    diff = {'Tracker': 0, 'Positions': 0}
+    for column, key, table in [('Cash', 'Cash', 'Tracker'), ('Value', 'Value', 'Tracker'), ('Benchmark', 'Benchmark', 'Tracker'),
+                               ('Cash', 'Cash', 'Positions'), ('Value', 'Value', 'Positions'), ('Benchmark', 'Multiplier', 'Positions')]:
+        expected = (tracker if table == 'Tracker' else positions)[column].to_numpy(dtype=float)
+        diff[table] = max(diff[table], np.abs(result[key][rows] - expected).max())
+    for k, ticker in enumerate(tickers):
+        diff['Tracker'] = max(diff['Tracker'], np.abs(result['Values'][rows, k] - tracker[ticker].to_numpy(dtype=float)).max())
+        diff['Positions'] = max(diff['Positions'], np.abs(result['Shares'][rows, k] - positions[ticker].to_numpy(dtype=float)).max())
+    return diff
+
+def runFast(rr: List[RelativeRotation], configurations: List[int], start: int = 170, end: int = 2517,
+            dates: List[str] = None, check: bool = False) -> dict:
+    """Runs the quadrant configurations on the array fast path. Nothing is written,
+        use runBacktest for audit runs with full trade logs.
+
+    Args:
+        rr (List[RelativeRotation]): List of relative rotation objects per sector
+        configurations (List[int]): Quadrant configurations, see intToBinary
+        start (int, optional): First day of backtest. Defaults to 170.
+        end (int, optional): Day to stop before. Defaults to 2517.
+        dates (List[str], optional): Date of each day, used to look up the risk free rate. Defaults to None, latest rate.
+        check (bool, optional): Print the differences from the files of an earlier full run. Defaults to False.
+
+    Returns:
+        dict: Quadrants: profit
+    """
+    closes = np.vstack([sector.prices.to_numpy() for sector in rr])
+    market = rr[0].market.to_numpy()
+    tickers = [sector.ticker for sector in rr]
+
+    profit = {}
+    for i, weights in weightMatrices(rr, configurations, start, end, dates).items():
+        result = simulate(weights, closes, market, start)
+        if(check): print(str(i) + ': ' + str(compareWithFiles(result, tickers, DIRECTORY + str(i) + '/')))
+        profit[str(intToBinary(i))] = result['Cash'][-1] + result['Shares'][-1] @ closes[:, end - 1] - ACCOUNT_START
+    return profit
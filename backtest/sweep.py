@@ -0,0 +1,276 @@
+# Relative Rotation Swing Trading Algorithm
+# Copyright (C) 2022  Shaurya Tathgir
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
+
+import argparse, csv, os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+import helpers
+from backtest import intToBinary, optimizedPortfolios
+from config import ACCOUNT_START, VOL_CUTOFF, VOL_INDEX
+from helpers import (PriceMatrix, RelativeRotation, RiskFreeRate, SetupRR,
+                     getRiskFreeRate, quadrantMatrix, selectionMask,
+                     volatilityMask)
+from Markowitz import OptimizerCache
+from simulate import simulate, weightRow
+from trade import authenticateAPI
+
+PARAMETERS = ['period', 'smoothing', 'change', 'cutoff', 'low', 'high']
+RESULTS = PARAMETERS + ['profit', 'value', 'benchmark', 'maxDrawdown']
+
+
+def parameterGrid(periods: List[int], smoothings: List[int], changes: List[int], cutoffs: List[float],
+                  lows: List[int], highs: List[int] = None) -> List[dict]:
+    """Every combination of the parameters
+
+    Args:
+        periods (List[int]): Normalization periods
+        smoothings (List[int]): SMA periods
+        changes (List[int]): Percent change days differences
+        cutoffs (List[float]): Volatility index cutoffs
+        lows (List[int]): Quadrant configurations used when volatility is low, see intToBinary
+        highs (List[int], optional): Configurations used when volatility is high. Defaults to None, same as low
+                                       so the cutoff has no effect.
+
+    Returns:
+        List[dict]: Points with PARAMETERS keys
+    """
+    if(highs is None):
+        configurations = [(x, x) for x in lows]
+        cutoffs = cutoffs[:1]
+    else:
+        configurations = list(product(lows, highs))
+    return [dict(zip(PARAMETERS, (p, s, c, v, low, high)))
+            for p, s, c, v, (low, high) in product(periods, smoothings, changes, cutoffs, configurations)]
+
+def sampleGrid(points: List[dict], samples: int, seed: int = 0) -> List[dict]:
+    """Random search, picks points of the grid without replacement. The same seed
+        gives the same points so a sweep can be resumed.
+
+    Args:
+        points (List[dict]): Output of parameterGrid
+        samples (int): Number of points
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        List[dict]: Sampled points
+    """
+    if(samples >= len(points)): return points
+    chosen = np.random.default_rng(seed).choice(len(points), samples, replace=False)
+    return [points[k] for k in sorted(chosen)]
+
+def pointKey(point: dict) -> tuple:
+    """Identifies a point in the results table
+
+    Args:
+        point (dict): Parameters
+
+    Returns:
+        tuple: Parameter values as strings, as read back from the csv
+    """
+    return tuple('' if point[x] is None else str(point[x]) for x in PARAMETERS)
+
+def completed(results: str) -> set:
+    """Points already in the results table
+
+    Args:
+        results (str): Path to csv
+
+    Returns:
+        set: Keys of finished points
+    """
+    if(not os.path.exists(results)): return set()
+    with open(results, newline='') as f:
+        return {pointKey(row) for row in csv.DictReader(f)}
+
+def firstMomentumDay(period: int, smoothing: int, change: int) -> int:
+    """First day with a JdK RS-Momentum value, the first non NaN of RelativeRotation.momentum.
+        The percent change of the RS-Ratio is only normalized from day 2 * period and needs
+        a value in its window, then it is smoothed over smoothing days.
+
+    Args:
+        period (int): Normalization period
+        smoothing (int): SMA period
+        change (int): Percent change days difference
+
+    Returns:
+        int: Day index
+    """
+    return max(2 * period, period + smoothing + change + 1) + smoothing - 1
+
+def _initWorker(matrix: PriceMatrix, sectors: List[str], market: str, volatility: np.ndarray, dates: List[str],
+                rates: RiskFreeRate) -> None:
+    """Stores the read only price data once per worker process
+
+    Args:
+        matrix (PriceMatrix): Aligned closes of the sectors and market
+        sectors (List[str]): Sector symbols
+        market (str): Market index symbol
+        volatility (np.ndarray): Volatility index level on each day of matrix
+        dates (List[str]): Date of each day
+        rates (RiskFreeRate): Rates loaded by the parent, so workers never touch the cache file
+    """
+    global shared
+    shared = {'matrix': matrix, 'sectors': sectors, 'market': market, 'volatility': volatility,
+              'dates': dates, 'rr': {}}
+    helpers.riskFree = rates
+    return
+
+def _relativeRotations(period: int, smoothing: int, change: int) -> List[RelativeRotation]:
+    """Relative rotation objects of the worker's data, built once per parameter set
+
+    Args:
+        period (int): Normalization period
+        smoothing (int): SMA period
+        change (int): Percent change days difference
+
+    Returns:
+        List[RelativeRotation]: One per sector
+    """
+    key = (period, smoothing, change)
+    if(key not in shared['rr']):
+        matrix = shared['matrix']
+        shared['rr'][key] = [RelativeRotation(x, matrix.series(x), matrix.series(shared['market']), period, smoothing, change)
+                             for x in shared['sectors']]
+    return shared['rr'][key]
+
+def evaluate(points: List[dict], start: int, end: int) -> List[dict]:
+    """Backtests a batch of points on the fast path. Points with the same relative rotation
+        settings share each day's assets and covariance, the optimizer cache is shared by
+        every point in the batch.
+
+    Args:
+        points (List[dict]): Parameters
+        start (int): First day of backtest
+        end (int): Day to stop before
+
+    Returns:
+        List[dict]: Rows with RESULTS keys
+    """
+    matrix = shared['matrix']
+    closes = np.vstack([matrix.row(x) for x in shared['sectors']])
+    market = matrix.row(shared['market'])
+    cache = OptimizerCache((end - start) * len(points))
+
+    groups = {}
+    for k, point in enumerate(points):
+        key = (point['period'], point['smoothing'], point['change'])
+        rr = _relativeRotations(*key)
+        quadrants = quadrantMatrix(np.vstack([x.relativeStrength.to_numpy() for x in rr]),
+                                   np.vstack([x.momentum.to_numpy() for x in rr]))
+        if(point['low'] == point['high']):
+            mask = selectionMask(quadrants, intToBinary(point['low']))
+        else:
+            mask = volatilityMask(quadrants, shared['volatility'], point['cutoff'],
+                                  intToBinary(point['low']), intToBinary(point['high']))
+        groups.setdefault(key, {})[k] = mask
+
+    weights = [np.zeros((end - start, len(shared['sectors']))) for _ in points]
+    for key, masks in groups.items():
+        rr = _relativeRotations(*key)
+        for j, portfolios, _ in optimizedPortfolios(rr, masks, start, end, shared['dates'], cache=cache):
+            for k, assets in portfolios.items():
+                weights[k][j - start] = weightRow(assets, rr)
+
+    rows = []
+    for point, weight in zip(points, weights):
+        result = simulate(weight, closes, market, start)
+        value = result['Cash'][-1] + result['Shares'][-1] @ closes[:, end - 1]
+        drawdown = 1 - result['Value'] / np.maximum.accumulate(result['Value'])
+        rows.append(dict(point, profit=value - ACCOUNT_START, value=value,
+                         benchmark=result['Benchmark'][-1], maxDrawdown=drawdown.max()))
+    return rows
+
+def runSweep(setup: SetupRR, points: List[dict], results: str, start: int = None, end: int = None,
+             workers: int = 1, batch: int = 8) -> pd.DataFrame:
+    """Runs the points not yet in the results table and appends each finished batch to it
+
+    Args:
+        setup (SetupRR): Loaded price data
+        points (List[dict]): Parameters, see parameterGrid
+        results (str): Path to results csv
+        start (int, optional): First day of backtest. Defaults to None, 10 days after the slowest
+                                 parameters produce their first momentum value, see firstMomentumDay.
+        end (int, optional): Day to stop before. Defaults to None, the last day of data.
+        workers (int, optional): Number of processes. Defaults to 1.
+        batch (int, optional): Points evaluated together by a worker. Defaults to 8.
+
+    Returns:
+        pd.DataFrame: Full results table
+    """
+    if(start is None): start = max(firstMomentumDay(x['period'], x['smoothing'], x['change']) for x in points) + 10
+    if(end is None): end = len(setup.matrix)
+
+    done = completed(results)
+    todo = [x for x in points if pointKey(x) not in done]
+    batches = [todo[k:k + batch] for k in range(0, len(todo), batch)]
+
+    history = setup.getPriceHistory(VOL_INDEX)
+    volDates = pd.to_datetime(history['Date']).to_numpy().astype('datetime64[D]')
+    volatility = history['Close'].to_numpy(dtype=float)[np.maximum(np.searchsorted(volDates, setup.matrix.dates, side='right') - 1, 0)]
+    getRiskFreeRate() # Load or refresh the rate cache once before the workers start
+    initargs = (setup.matrix, setup.sectors, setup.market, volatility, setup.dates, helpers.riskFree)
+
+    new = not os.path.exists(results)
+    with open(results, 'a', newline='') as f:
+        writer = csv.DictWriter(f, RESULTS)
+        if(new): writer.writeheader()
+
+        if(workers <= 1):
+            _initWorker(*initargs)
+            finished = map(evaluate, batches, [start] * len(batches), [end] * len(batches))
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=initargs)
+            finished = pool.map(evaluate, batches, [start] * len(batches), [end] * len(batches))
+
+        try:
+            for rows in finished:
+                writer.writerows(rows)
+                f.flush()
+        finally:
+            if(workers > 1): pool.shutdown()
+
+    return pd.read_csv(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sweep relative rotation parameters, volatility cutoff and quadrants')
+    parser.add_argument('--period', type=int, nargs='+', default=[50], help='Normalization periods')
+    parser.add_argument('--smoothing', type=int, nargs='+', default=[50], help='SMA periods')
+    parser.add_argument('--change', type=int, nargs='+', default=[10], help='Percent change days differences')
+    parser.add_argument('--cutoff', type=float, nargs='+', default=[VOL_CUTOFF], help='Volatility index cutoffs')
+    parser.add_argument('--low', type=int, nargs='+', default=list(range(1, 16)), help='Quadrant configurations when volatility is low')
+    parser.add_argument('--high', type=int, nargs='+', default=None, help='Quadrant configurations when volatility is high, defaults to low')
+    parser.add_argument('--samples', type=int, default=0, help='Random search over this many grid points, 0 for the full grid')
+    parser.add_argument('--seed', type=int, default=0, help='Random search seed')
+    parser.add_argument('--start', type=int, default=None, help='First day of backtest')
+    parser.add_argument('--end', type=int, default=None, help='Day to stop before')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes')
+    parser.add_argument('--batch', type=int, default=8, help='Points evaluated together by a worker')
+    parser.add_argument('--results', default='sweep.csv', help='Results csv, existing rows are skipped')
+    args = parser.parse_args()
+
+    points = parameterGrid(args.period, args.smoothing, args.change, args.cutoff, args.low, args.high)
+    if(args.samples): points = sampleGrid(points, args.samples, args.seed)
+
+    setup = SetupRR(authenticateAPI(), appendQuotes=False)
+    table = runSweep(setup, points, args.results, args.start, args.end, args.workers, args.batch)
+    print(table.sort_values('profit', ascending=False).head(10).to_string(index=False))
@@ -0,0 +1,303 @@
+# Relative Rotation Swing Trading Algorithm
+# Copyright (C) 2022  Shaurya Tathgir
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
+
+from datetime import datetime
+from threading import Lock
+from time import monotonic, sleep
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from config import ACCOUNT_START
+from prices import PriceProvider
+
+TERMINAL = ['FILLED', 'REJECTED', 'CANCELED', 'EXPIRED']
+
+
+class SimulatedBroker:
+    """In process stand in for TDClient. Implements the endpoints used by the project
+        on top of local daily closes so trade.py can run without network access.
+        Bars before today are price history and today's close is the quote and fill price.
+    """
+    def __init__(self, provider: PriceProvider, tickers: List[str], today: str = None, cash: float = ACCOUNT_START,
+                 latency: float = 0, fillDelay: float = 0, fillRatio: float = 1, reject: List[str] = None,
+                 isOpen: bool = True) -> None:
+        """Creates the broker
+
+        Args:
+            provider (PriceProvider): Source of daily closes, eg: LocalPriceProvider
+            tickers (List[str]): Symbols in the watchlist
+            today (str, optional): Simulated trading day eg: '2022/01/14'. Defaults to None, the last bar of each symbol.
+            cash (float, optional): Starting cash balance. Defaults to ACCOUNT_START.
+            latency (float, optional): Seconds every request takes. Defaults to 0.
+            fillDelay (float, optional): Seconds between placing an order and its fill. Defaults to 0.
+            fillRatio (float, optional): Part of each order that fills, the rest stays working until cancelled. Defaults to 1.
+            reject (List[str], optional): Symbols whose orders are rejected. Defaults to None.
+            isOpen (bool, optional): Reported market status. Defaults to True.
+        """
+        self.provider = provider
+        self.tickers = list(tickers)
+        self.today = None if today is None else np.datetime64(pd.Timestamp(today).date(), 'D')
+        self.cash = cash
+        self.latency = latency
+        self.fillDelay = fillDelay
+        self.fillRatio = fillRatio
+        self.reject = set(reject or [])
+        self.isOpen = isOpen
+
+        self.positions = {}
+        self.orders = {}
+        self.requests = 0
+        self._bars = {}
+        self._lock = Lock()
+        return
+
+    def setAccount(self, positions: dict, cash: float) -> None:
+        """Replaces the simulated account, eg: with the holdings of a resumed ledger
+
+        Args:
+            positions (dict): Symbol: quantity held
+            cash (float): Cash balance
+        """
+        with self._lock:
+            self.positions = dict(positions)
+            self.cash = cash
+        return
+
+    def _request(self) -> None:
+        """Counts a request and waits out the simulated latency
+        """
+        with self._lock: self.requests += 1
+        if(self.latency > 0): sleep(self.latency)
+        return
+
+    def _history(self, symbol: str) -> pd.DataFrame:
+        """Every bar of a symbol up to and including today
+
+        Args:
+            symbol (str): Symbol for asset
+
+        Returns:
+            pd.DataFrame: 'Date' as datetime64 and 'Close' columns, oldest first
+        """
+        if(symbol not in self._bars):
+            bars = self.provider.getPriceHistory(symbol)
+            bars = pd.DataFrame({'Date': pd.to_datetime(bars['Date']), 'Close': bars['Close'].to_numpy(dtype=float)})
+            if(self.today is not None): bars = bars[bars['Date'] <= pd.Timestamp(self.today)]
+            self._bars[symbol] = bars.reset_index(drop=True)
+        return self._bars[symbol]
+
+    def getDate(self, symbol: str) -> str:
+        """Simulated trading day
+
+        Args:
+            symbol (str): Symbol whose last bar is the day when no day was given, eg: the market index
+
+        Returns:
+            str: Date eg: '2022/01/14'
+        """
+        day = self._history(symbol)['Date'].iloc[-1] if self.today is None else pd.Timestamp(self.today)
+        return day.strftime("%Y/%m/%d")
+
+    def _price(self, symbol: str) -> float:
+        """Close on the simulated day
+
+        Args:
+            symbol (str): Symbol for asset
+
+        Returns:
+            float: Price in dollars
+        """
+        return float(self._history(symbol)['Close'].iloc[-1])
+
+    def login(self) -> bool:
+        """Nothing to authenticate
+
+        Returns:
+            bool: Always True
+        """
+        return True
+
+    def get_price_history(self, symbol: str, period_type: str = 'year', period: int = None, start_date: int = None,
+                          end_date: int = None, frequency_type: str = 'daily', frequency: int = 1,
+                          extended_hours: bool = False) -> dict:
+        """Daily candles before the simulated day
+
+        Args:
+            symbol (str): Symbol for asset
+            period_type (str, optional): Only 'year' is supported. Defaults to 'year'.
+            period (int, optional): Years of history when no start date is given. Defaults to None, 10 years.
+            start_date (int, optional): First day in epoch milliseconds. Defaults to None.
+            end_date (int, optional): Ignored, history always ends the day before the simulated day. Defaults to None.
+            frequency_type (str, optional): Only 'daily' is supported. Defaults to 'daily'.
+            frequency (int, optional): Only 1 is supported. Defaults to 1.
+            extended_hours (bool, optional): Ignored. Defaults to False.
+
+        Returns:
+            dict: Candles under 'candles' with 'close' and 'datetime' keys
+        """
+        self._request()
+        bars = self._history(symbol).iloc[:-1]
+        if(start_date is not None):
+            bars = bars[bars['Date'] >= pd.Timestamp(start_date, unit='ms').normalize()]
+        else:
+            bars = bars[bars['Date'] >= bars['Date'].iloc[-1] - pd.DateOffset(years=period or 10)]
+        candles = [{'close': close, 'datetime': int(datetime.combine(date.date(), datetime.min.time()).timestamp() * 1000)}
+                   for date, close in zip(bars['Date'], bars['Close'])]
+        return {'candles': candles, 'symbol': symbol, 'empty': len(candles) == 0}
+
+    def get_quotes(self, instruments: List[str]) -> dict:
+        """Last prices, the close on the simulated day
+
+        Args:
+            instruments (List[str]): Symbols to quote
+
+        Returns:
+            dict: Symbol: quote with 'lastPrice'
+        """
+        self._request()
+        return {symbol: {'symbol': symbol, 'lastPrice': self._price(symbol)} for symbol in instruments}
+
+    def get_watchlist(self, account: str, watchlist_id: str) -> dict:
+        """The simulated watchlist
+
+        Args:
+            account (str): Ignored
+            watchlist_id (str): Ignored
+
+        Returns:
+            dict: Symbols under 'watchlistItems'
+        """
+        self._request()
+        return {'watchlistId': watchlist_id, 'watchlistItems': [{'instrument': {'symbol': x, 'assetType': 'EQUITY'}}
+                                                                 for x in self.tickers]}
+
+    def get_market_hours(self, markets: List[str], date: str) -> dict:
+        """Market status
+
+        Args:
+            markets (List[str]): Ignored, always the equity market
+            date (str): Ignored
+
+        Returns:
+            dict: isOpen under ['equity']['EQ']
+        """
+        self._request()
+        return {'equity': {'EQ': {'date': date, 'marketType': 'EQUITY', 'isOpen': self.isOpen}}}
+
+    def get_accounts(self, account: str, fields: List[str] = None) -> dict:
+        """Cash and positions after every fill so far
+
+        Args:
+            account (str): Account number
+            fields (List[str], optional): Ignored, positions are always included. Defaults to None.
+
+        Returns:
+            dict: Account under 'securitiesAccount'
+        """
+        self._request()
+        with self._lock:
+            for orderId in list(self.orders): self._fill(orderId)
+            positions = [{'instrument': {'symbol': x, 'assetType': 'EQUITY'}, 'longQuantity': q,
+                          'marketValue': q * self._price(x)} for x, q in self.positions.items() if q != 0]
+            return {'securitiesAccount': {'accountId': account, 'positions': positions,
+                                          'currentBalances': {'cashBalance': self.cash}}}
+
+    def place_order(self, account: str, order: dict) -> dict:
+        """Accepts a single leg equity order. Buys costing more than the cash balance are rejected.
+
+        Args:
+            account (str): Account number
+            order (dict): Order payload
+
+        Returns:
+            dict: New id under 'order_id'
+        """
+        self._request()
+        leg = order['orderLegCollection'][0]
+        symbol = leg['instrument']['symbol']
+        quantity = int(leg['quantity'])
+        side = -1 if leg['instruction'].lower() == 'sell' else 1
+        price = self._price(symbol)
+
+        with self._lock:
+            orderId = str(len(self.orders) + 1)
+            status = 'WORKING'
+            if(symbol in self.reject or quantity <= 0): status = 'REJECTED'
+            elif(side > 0 and quantity * price > self.cash): status = 'REJECTED'
+            elif(side < 0 and quantity > self.positions.get(symbol, 0)): status = 'REJECTED'
+            self.orders[orderId] = {'orderId': orderId, 'accountId': account, 'status': status, 'quantity': quantity,
+                                    'filledQuantity': 0, 'remainingQuantity': quantity, 'orderActivityCollection': [],
+                                    'orderLegCollection': order['orderLegCollection'], 'symbol': symbol, 'side': side, 'price': price,
+                                    'placed': monotonic()}
+        return {'order_id': orderId, 'status_code': 201}
+
+    def _fill(self, orderId: str) -> None:
+        """Executes the fillable part of a working order once its delay has passed. Call with the lock held.
+
+        Args:
+            orderId (str): Broker order id
+        """
+        order = self.orders[orderId]
+        if(order['status'] != 'WORKING' or monotonic() - order['placed'] < self.fillDelay): return
+        shares = int(order['quantity'] * self.fillRatio) - order['filledQuantity']
+        if(shares > 0):
+            order['filledQuantity'] += shares
+            order['remainingQuantity'] -= shares
+            order['orderActivityCollection'].append({'activityType': 'EXECUTION', 'executionType': 'FILL', 'quantity': shares,
+                                                     'executionLegs': [{'quantity': shares, 'price': order['price']}]})
+            self.positions[order['symbol']] = self.positions.get(order['symbol'], 0) + order['side'] * shares
+            self.cash -= order['side'] * shares * order['price']
+        if(order['remainingQuantity'] == 0): order['status'] = 'FILLED'
+        return
+
+    def get_orders(self, account: str, order_id: str) -> dict:
+        """Reads an order
+
+        Args:
+            account (str): Account number
+            order_id (str): Broker order id
+
+        Returns:
+            dict: Order with 'status', 'filledQuantity', 'remainingQuantity' and 'orderActivityCollection'
+        """
+        self._request()
+        with self._lock:
+            self._fill(order_id)
+            order = self.orders[order_id]
+            return {x: order[x] for x in ['orderId', 'accountId', 'status', 'quantity', 'filledQuantity',
+                                          'remainingQuantity', 'orderLegCollection']} | \
+                   {'orderActivityCollection': [dict(x) for x in order['orderActivityCollection']]}
+
+    def cancel_order(self, account: str, order_id: str) -> dict:
+        """Cancels the unfilled part of an order
+
+        Args:
+            account (str): Account number
+            order_id (str): Broker order id
+
+        Returns:
+            dict: Order id under 'order_id'
+        """
+        self._request()
+        with self._lock:
+            self._fill(order_id)
+            order = self.orders[order_id]
+            if(order['status'] not in TERMINAL): order['status'] = 'CANCELED'
+        return {'order_id': order_id, 'status_code': 200}
@@ -17,13 +17,14 @@
 # Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
 
 from datetime import datetime
-from typing import List
+from typing import Dict, List
 
 import pandas as pd
 
 from aws import *
 from graphs import *
 from helpers import *
+from orders import OrderResult
 
 def marketClosed() -> None:
     """Indicates market closure
@@ -49,6 +50,27 @@ def sendTrades(trades: pd.DataFrame) -> None:
         message = ' '.join(message) + str(round(price, 2))
         sms(message)
 
+def orderIssue(result: OrderResult) -> str:
+    """Describes an order that was not completely filled
+
+    Args:
+        result (OrderResult): Outcome of the order
+
+    Returns:
+        str: Message eg: 'XLK order partial: 5 of 10 shares filled.'
+    """
+    return '%s order %s: %d of %d shares filled.' % (result.symbol, result.status, abs(result.filled), abs(result.requested))
+
+def sendOrderIssues(issues: Dict[str, OrderResult]) -> None:
+    """Sends the orders that were partially filled, rejected or expired
+
+    Args:
+        issues (Dict[str, OrderResult]): Symbol: outcome, see trade.rebalance
+    """
+    for result in issues.values():
+        sms(orderIssue(result))
+    return
+
 def sendChart(img: str) -> None:
     """Sends image link to object uploaded to s3
 
@@ -78,15 +100,17 @@ def summary(alpha: float, beta: float, sharpe: float, plTD: float, percentReturn
     sms(message)
     return
 
-def publish(book, rr: List[RelativeRotation]) -> None:
+def publish(book, rr: List[RelativeRotation], issues: Dict[str, OrderResult] = None) -> None:
     """Sends all summary data for portfolio
 
     Args:
         book (PositionTracker): Position tracker
         rr (List[RelativeRotation]): List of all relative rotation objects for circular graph
+        issues (Dict[str, OrderResult], optional): Orders that were not completely filled. Defaults to None.
     """
     todayTrades = book.trades.loc[book.trades['Date'] == datetime.now().strftime("%Y/%m/%d")]
     sendTrades(todayTrades)
+    sendOrderIssues(issues or {})
 
     plotRRG(rr)
     sendChart(RRG_NAME)
@@ -0,0 +1,259 @@
+# Relative Rotation Swing Trading Algorithm
+# Copyright (C) 2022  Shaurya Tathgir
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
+
+"""
+Everything the portfolio code needs from the outside world. Live runs and backtests
+    share SetupRR, PositionTracker, calculatePositions, rebalance and logTrades and
+    only differ in the environment they are given:
+
+    clock:   Labels the current and previous trading day. Dates for live runs, day
+             indices into the price matrix for backtests.
+    quotes:  Last prices, QuoteSnapshot live and MatrixQuotes in a backtest.
+    venue:   Executes trades and reports holdings, orders.OrderExecutor live and
+             orders.InstantExecutor in a backtest.
+    storage: Keeps the tracker, trades and positions files, S3Storage live and
+             LocalStorage offline or in a backtest.
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+import pandas as pd
+from td.client import TDClient
+
+from aws import s3Download, s3Upload
+from helpers import Data, PriceMatrix
+from orders import OrderExecutor
+
+
+class LiveClock:
+    """Wall clock, days are labelled by date
+    """
+    def today(self) -> str:
+        """Label of the current trading day
+
+        Returns:
+            str: Date eg: '2022/01/14'
+        """
+        return datetime.now().strftime("%Y/%m/%d")
+
+    def yesterday(self) -> str:
+        """Label of the day before the first trading day
+
+        Returns:
+            str: Date eg: '2022/01/13'
+        """
+        return (datetime.now() - timedelta(days=1)).strftime("%Y/%m/%d")
+
+class SessionClock:
+    """Clock stopped on one trading day, days are labelled by date. Used offline so the
+        files are dated by the simulated day instead of the wall clock.
+    """
+    def __init__(self, day: str) -> None:
+        """Creates the clock
+
+        Args:
+            day (str): Trading day eg: '2022/01/14'
+        """
+        self.day = pd.Timestamp(day)
+        return
+
+    def today(self) -> str:
+        """Label of the current trading day
+
+        Returns:
+            str: Date eg: '2022/01/14'
+        """
+        return self.day.strftime("%Y/%m/%d")
+
+    def yesterday(self) -> str:
+        """Label of the day before the first trading day
+
+        Returns:
+            str: Date eg: '2022/01/13'
+        """
+        return (self.day - timedelta(days=1)).strftime("%Y/%m/%d")
+
+class BacktestClock:
+    """Simulated clock, days are labelled by their index in the price matrix
+    """
+    def __init__(self, day: int = 0) -> None:
+        """Creates the clock
+
+        Args:
+            day (int, optional): Current day. Defaults to 0.
+        """
+        self.day = day
+        return
+
+    def advance(self, day: int) -> None:
+        """Moves the clock to a day
+
+        Args:
+            day (int): Day of backtest
+        """
+        self.day = day
+        return
+
+    def today(self) -> int:
+        """Label of the current trading day
+
+        Returns:
+            int: Day
+        """
+        return self.day
+
+    def yesterday(self) -> int:
+        """Label of the day before the first trading day
+
+        Returns:
+            int: Day
+        """
+        return self.day - 1
+
+class MatrixQuotes:
+    """Last prices read from a price matrix on the clock's day. Same interface as QuoteSnapshot.
+    """
+    def __init__(self, matrix: PriceMatrix, clock: BacktestClock) -> None:
+        """Creates the price source
+
+        Args:
+            matrix (PriceMatrix): Aligned closes
+            clock (BacktestClock): Picks the column
+        """
+        self.matrix = matrix
+        self.clock = clock
+        return
+
+    def prefetch(self, symbols: List[str]) -> None:
+        """Nothing to fetch
+
+        Args:
+            symbols (List[str]): Ignored
+        """
+        return
+
+    def refresh(self, symbols: List[str] = None) -> None:
+        """Nothing to fetch
+
+        Args:
+            symbols (List[str], optional): Ignored. Defaults to None.
+        """
+        return
+
+    def getLastPrice(self, symbol: str) -> float:
+        """Close on the clock's day
+
+        Args:
+            symbol (str): Ticker
+
+        Returns:
+            float: Price in dollars
+        """
+        return self.matrix.values[self.matrix.index[symbol], self.clock.day]
+
+class S3Storage:
+    """Files kept in the s3 bucket, written to the working directory before upload
+    """
+    def load(self, name: str) -> pd.DataFrame:
+        """Reads a file
+
+        Args:
+            name (str): File name
+
+        Returns:
+            pd.DataFrame: Contents. None if the file does not exist.
+        """
+        return s3Download(name)
+
+    def save(self, frame: pd.DataFrame, name: str) -> None:
+        """Writes a file
+
+        Args:
+            frame (pd.DataFrame): Contents
+            name (str): File name
+        """
+        frame.to_csv(name, index=False)
+        s3Upload(name)
+        return
+
+class LocalStorage:
+    """Files kept in a local folder
+    """
+    def __init__(self, directory: str) -> None:
+        """Creates the folder if needed
+
+        Args:
+            directory (str): Folder for the files
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        return
+
+    def load(self, name: str) -> pd.DataFrame:
+        """Reads a file
+
+        Args:
+            name (str): File name
+
+        Returns:
+            pd.DataFrame: Contents. None if the file does not exist.
+        """
+        path = os.path.join(self.directory, name)
+        if(not os.path.exists(path)): return
+        return pd.read_csv(path)
+
+    def save(self, frame: pd.DataFrame, name: str) -> None:
+        """Writes a file
+
+        Args:
+            frame (pd.DataFrame): Contents
+            name (str): File name
+        """
+        frame.to_csv(os.path.join(self.directory, name), index=False)
+        return
+
+@dataclass
+class Environment:
+    """Clock, price source, execution venue and storage backend of a run
+    """
+    clock: object
+    quotes: object
+    venue: object
+    storage: object
+    tickers: List[str]
+
+def liveEnvironment(TDSession: TDClient, directory: str = None, clock = None) -> Environment:
+    """Environment of a live or offline run
+
+    Args:
+        TDSession (TDClient): Authenticated API connection object, or a broker.SimulatedBroker
+        directory (str, optional): Keep the files in this local folder instead of s3. Defaults to None.
+        clock (optional): Labels the trading days, eg: SessionClock for the simulated day. Defaults to None, LiveClock.
+
+    Returns:
+        Environment: Wall clock unless given, session quote snapshot, broker orders and s3 or local files
+    """
+    grabber = Data(TDSession)
+    return Environment(clock = clock or LiveClock(),
+                       quotes = grabber.quotes,
+                       venue = OrderExecutor(TDSession),
+                       storage = S3Storage() if directory is None else LocalStorage(directory),
+                       tickers = grabber.getTickers()['tickers'])
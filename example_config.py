@@ -32,6 +32,10 @@ PORT_PLOT_NAME = None   # Name of portfolio plot file eg: 'portfolio.png'
 TRACKER = None          # Name of value tracker csv file eg: 'tracker.csv'
 TRADES = None           # Name of trade tracker csv file eg: 'trades.csv'
 POSITIONS = None        # Name of positions tracker csv file eg: 'positions.csv'
+RFR_CACHE = None        # Name of local risk free rate cache csv file eg: 'rfr.csv'
+PRICE_DIR = None        # Folder for the local daily price store eg: 'prices'
+RR_STATE_DIR = None     # Folder for the streaming relative rotation states eg: 'rotation'
+DIRECTORY = None        # Folder for backtest results eg: 'files/'
 
 ACCOUNT_START = None    # Cash available to the strategy
 LV_QUADRANTS = None     # Which quadrants to use when volatility is low
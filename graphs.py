@@ -74,11 +74,12 @@ def plotRRG(rr: List[RelativeRotation], period: int = 15, padding: int = 0.5) ->
     plt.savefig(RRG_NAME)
     return
 
-def plotPie(tracker: pd.DataFrame) -> None:
+def plotPie(tracker: pd.DataFrame, location: str = '') -> None:
     """Creates a pie chart to show portfolio weights
 
     Args:
         tracker (pd.DataFrame): Current holdings values
+        location (str, optional): Directory to save the plot. Defaults to the working directory.
     """
     labels = tracker.columns[1:-2]
     values = tracker.iloc[tracker.shape[0] - 1]
@@ -93,19 +94,20 @@ def plotPie(tracker: pd.DataFrame) -> None:
     fig.patch.set_facecolor('white')
     ax.pie(sizes, labels=labels, autopct='%1.1f%%')
     ax.axis('equal')
-    plt.savefig(PIE_NAME)
+    plt.savefig(location + PIE_NAME)
     return
 
-def plotPortfolio(tracker: pd.DataFrame) -> None:
+def plotPortfolio(tracker: pd.DataFrame, location: str = '') -> None:
     """Plots portfolio holdings over time
 
     Args:
         tracker (pd.DataFrame): Portfolio holdings over time
+        location (str, optional): Directory to save the plot. Defaults to the working directory.
     """
     fig = plt.figure(dpi = 600)
     fig.patch.set_facecolor('white')
     plot = tracker.plot(x = 'Date', rot = 90, ax=plt.gca())
     plt.legend(bbox_to_anchor=(1, 1))
     fig = plot.get_figure()
-    fig.savefig(PORT_PLOT_NAME, bbox_inches='tight')
+    fig.savefig(location + PORT_PLOT_NAME, bbox_inches='tight')
     return
\ No newline at end of file
@@ -16,28 +16,38 @@
 
 # Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
 
+import json
+import os
 from collections import Counter as check
+from collections import deque
+from copy import deepcopy
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import reduce
+from typing import List, Tuple
 
+import numpy as np
 import pandas as pd
 import quandl
 from multipledispatch import dispatch
-from numpy import mean, nan, std
+from numpy import nan
 from td.client import TDClient
 
-from aws import s3Download, s3Upload
 from config import *
+from prices import (PriceProvider, PriceStore, TDPriceProvider,
+                    fetchConcurrently, getQuoteSnapshot)
 
 
-@dataclass
+@dataclass(slots=True)
 class Asset:
-    """Asset data store class
+    """Asset data store class. Holds scalars and a view of the asset's closes in the
+        shared price matrix instead of its own price series.
     """
     ticker: str
     relativeStrength: float
     momentum: float
-    prices: pd.Series
+    closes: np.ndarray
+    day: int
     lastPrice: float
     avgRet: float = None
     quadrant: int = None
@@ -50,10 +60,19 @@ class Asset:
         self._setRet()
         return
     
+    @property
+    def prices(self) -> np.ndarray:
+        """Closes up to the asset's day
+
+        Returns:
+            np.ndarray: View of the shared closes
+        """
+        return self.closes[:self.day]
+    
     def _setRet(self) -> None:
         """Calculates average annual return for the asset
         """
-        self.avgRet = (self.prices[len(self.prices) - 1] / self.prices[1]) ** (365 / len(self.prices)) - 1
+        self.avgRet = (self.closes[self.day - 1] / self.closes[1]) ** (365 / self.day) - 1
         return
     
     def _setQuadrant(self) -> None:
@@ -70,6 +89,89 @@ class Asset:
             self.quadrant = 4
         return
 
+def quadrantMatrix(relativeStrength: np.ndarray, momentum: np.ndarray) -> np.ndarray:
+    """Vectorized Asset._setQuadrant over whole histories. NaN compares false
+        so it lands in the same quadrant as with the scalar comparisons.
+
+    Args:
+        relativeStrength (np.ndarray): JdK RS-Ratio, eg: shape [symbols x days]
+        momentum (np.ndarray): JdK RS-Momentum, same shape
+
+    Returns:
+        np.ndarray: Quadrant 1 to 4 of each value
+    """
+    return np.where(relativeStrength >= 100, np.where(momentum >= 100, 1, 2), np.where(momentum < 100, 3, 4))
+
+def selectionMask(quadrants: np.ndarray, configuration: List[int]) -> np.ndarray:
+    """Which assets a quadrant configuration includes
+
+    Args:
+        quadrants (np.ndarray): Output of quadrantMatrix
+        configuration (List[int]): Include flag per quadrant, eg: [1, 1, 0, 0]
+
+    Returns:
+        np.ndarray: True where the asset is included
+    """
+    return np.asarray(configuration, dtype=bool)[quadrants - 1]
+
+def volatilityMask(quadrants: np.ndarray, volatility, cutoff: float, lowVol: List[int], highVol: List[int]) -> np.ndarray:
+    """Selection that switches configuration on the volatility index
+
+    Args:
+        quadrants (np.ndarray): Output of quadrantMatrix, shape [symbols x days] or [symbols]
+        volatility: Volatility index level per day, or a single level
+        cutoff (float): Level below which volatility is low
+        lowVol (List[int]): Configuration when volatility is low
+        highVol (List[int]): Configuration when volatility is high
+
+    Returns:
+        np.ndarray: True where the asset is included
+    """
+    return np.where(np.asarray(volatility) < cutoff, selectionMask(quadrants, lowVol), selectionMask(quadrants, highVol))
+
+def rollingZScore(data: np.ndarray, period: int) -> np.ndarray:
+    """Vectorized z-score of each value against the previous period values. Uses
+        cumulative sums so the cost is linear in the length of the data. NaNs in
+        the look back window are skipped and the first period values are NaN.
+        Constant windows, found from run lengths of equal values, give NaN or inf
+        like an explicit 0 / 0 or x / 0.
+
+    Args:
+        data (np.ndarray): Data to be normalized
+        period (int): Look back period
+
+    Returns:
+        np.ndarray: 100 + z-score of each value
+    """
+    normalized = np.full(len(data), nan)
+    if(len(data) <= period): return normalized
+    
+    valid = ~np.isnan(data)
+    shift = data[valid].mean() if valid.any() else 0 # Centering keeps the sums of squares well conditioned
+    centered = np.where(valid, data - shift, 0)
+    
+    count = np.concatenate(([0], np.cumsum(valid)))
+    total = np.concatenate(([0], np.cumsum(centered)))
+    squares = np.concatenate(([0], np.cumsum(centered ** 2)))
+    
+    values = np.append(data[valid], nan)
+    k = np.arange(len(values) - 1)
+    new = np.ones(len(k), dtype=bool)
+    new[1:] = values[1:-1] != values[:-2]
+    starts = np.maximum.accumulate(np.where(new, k, 0))
+    run = np.append(k - starts + 1, 0) # Values in a row equal to each one, skipping NaNs
+    
+    n = count[period:-1] - count[:-period-1]
+    last = count[period:-1] - 1 # Newest value in each window, -1 picks the padding when there is none
+    flat = (n > 0) & (run[last] >= n) # Constant windows have exactly zero variance and their value as mean
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg = (total[period:-1] - total[:-period-1]) / n
+        var = (squares[period:-1] - squares[:-period-1]) / n - avg ** 2
+        var = np.where(n > 1, np.maximum(var, 0), 0)
+        deviation = np.where(flat, data[period:] - values[last], data[period:] - shift - avg)
+        normalized[period:] = 100 + deviation / np.sqrt(np.where(flat, 0, var))
+    return normalized
+
 class RelativeRotation:
     """Relative rotation asset class
     """
@@ -102,10 +204,31 @@ class RelativeRotation:
         asset = Asset(ticker = self.ticker,
                       relativeStrength = self.relativeStrength[self.relativeStrength.index[-1]],
                       momentum = self.momentum[self.momentum.index[-1]],
-                      prices = self.prices,
+                      closes = self.prices.to_numpy(),
+                      day = len(self.prices),
                       lastPrice = self.prices[self.prices.index[-1]])
         return asset
 
+    def snapshot(self, day: int) -> Asset:
+        """Creates an asset allocation object as of a backtest day, the same way getAsset
+            does for today. Its prices are a view of the closes up to and including the day,
+            so no history is copied.
+
+        Args:
+            day (int): Day of backtest
+
+        Returns:
+            Asset: Dataclass object with relevant info
+        """
+        closes = self.prices.to_numpy()
+        asset = Asset(ticker = self.ticker,
+                      relativeStrength = self.relativeStrength[day],
+                      momentum = self.momentum[day],
+                      closes = closes,
+                      day = day + 1,
+                      lastPrice = closes[day])
+        return asset
+
     def normalize(self, data: pd.Series) -> pd.Series:
         """Normalizes data using z-score method
 
@@ -115,12 +238,7 @@ class RelativeRotation:
         Returns:
             pd.Series: Normalized data
         """
-        normalized = [nan] * self.period
-        for t in range(self.period, len(data)):
-            lookBackPeriod = data[t-self.period:t]
-            val = 100 + ((data[t] - mean(lookBackPeriod))/(std(lookBackPeriod)))
-            normalized.append(val)
-        
+        normalized = rollingZScore(data.to_numpy(dtype=float), self.period)
         return pd.Series(normalized).rolling(self.smoothing).mean()
 
     def jdkRSRatio(self, asset: pd.Series, market: pd.Series) -> pd.Series:
@@ -167,16 +285,526 @@ class RelativeRotation:
         rs = self.jdkRSRatio(asset, market)
         return self.jdkRSMomentum(rs)
 
+class RollingWindow:
+    """Fixed length window that keeps running sums of its finite values
+    """
+    def __init__(self, size: int) -> None:
+        """Creates an empty window
+
+        Args:
+            size (int): Number of values kept in the window
+        """
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.shift = 0.0
+        self.total = 0.0
+        self.squares = 0.0
+        self.count = 0
+        self.pushes = 0
+        self.last = nan
+        self.run = 0
+        return
+    
+    def push(self, value: float) -> None:
+        """Adds a value to the window, dropping the oldest value once full
+
+        Args:
+            value (float): New value
+        """
+        if(len(self.values) == self.size):
+            self._remove(self.values[0])
+        self.values.append(value)
+        self._add(value)
+        self._track(value)
+        
+        self.pushes += 1
+        if(self.pushes % self.size == 0): self._resum()
+        return
+    
+    def _add(self, value: float) -> None:
+        """Adds a value to the running sums
+
+        Args:
+            value (float): Value entering the window
+        """
+        if(np.isfinite(value)):
+            self.total += value - self.shift
+            self.squares += (value - self.shift) ** 2
+            self.count += 1
+        return
+    
+    def _track(self, value: float) -> None:
+        """Counts how many of the latest finite values equal the newest one
+
+        Args:
+            value (float): Value entering the window
+        """
+        if(np.isfinite(value)):
+            self.run = self.run + 1 if value == self.last else 1
+            self.last = value
+        return
+    
+    def _remove(self, value: float) -> None:
+        """Removes a value from the running sums
+
+        Args:
+            value (float): Value leaving the window
+        """
+        if(np.isfinite(value)):
+            self.total -= value - self.shift
+            self.squares -= (value - self.shift) ** 2
+            self.count -= 1
+        return
+    
+    def _resum(self) -> None:
+        """Recomputes the running sums from the window to stop rounding errors from drifting
+        """
+        finite = [x for x in self.values if np.isfinite(x)]
+        self.shift = float(np.mean(finite)) if finite else 0.0
+        self.total = 0.0
+        self.squares = 0.0
+        self.count = 0
+        for value in self.values:
+            self._add(value)
+        return
+    
+    def mean(self) -> float:
+        """Simple moving average, only defined once the window is full of finite values
+
+        Returns:
+            float: Mean of the window
+        """
+        if(self.count < self.size): return nan
+        return self.shift + self.total / self.count
+    
+    def zScore(self, value: float) -> float:
+        """Normalizes a value against the finite values in the window
+
+        Args:
+            value (float): Value to normalize
+
+        Returns:
+            float: 100 + z-score of the value
+        """
+        if(self.count == 0): return nan
+        if(self.run >= self.count): # Constant window, exactly zero variance and its value as mean
+            deviation, var = value - self.last, 0
+        else:
+            avg = self.total / self.count
+            deviation, var = value - self.shift - avg, max(self.squares / self.count - avg ** 2, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return float(100 + np.float64(deviation) / np.sqrt(var))
+    
+    def getState(self) -> dict:
+        """Serializable window state
+
+        Returns:
+            dict: Window values and running sums
+        """
+        return {'size': self.size, 'values': list(self.values), 'shift': self.shift, 'total': self.total,
+                'squares': self.squares, 'count': self.count, 'pushes': self.pushes, 'last': self.last, 'run': self.run}
+    
+    @classmethod
+    def fromState(cls, state: dict) -> 'RollingWindow':
+        """Rebuilds a window from getState output
+
+        Args:
+            state (dict): Window state
+
+        Returns:
+            RollingWindow: Restored window
+        """
+        window = cls(state['size'])
+        window.values.extend(state['values'])
+        for key in ['shift', 'total', 'squares', 'count', 'pushes', 'last', 'run']:
+            setattr(window, key, state[key])
+        return window
+
+class StreamingRelativeRotation:
+    """Relative rotation values updated one bar at a time. Produces the same
+        values as RelativeRotation without keeping the price history.
+    """
+    def __init__(self, ticker: str, period: int = 50, smoothing: int = 50, change: int = 10, trail: int = 15) -> None:
+        """Creates an empty calculator
+
+        Args:
+            ticker (str): Symbol for sector
+            period (int, optional): normalization period. Defaults to 50.
+            smoothing (int, optional): SMA period to apply to final values. Defaults to 50.
+            change (int, optional): percent change days difference. Defaults to 10.
+            trail (int, optional): Number of recent values kept for the RRG plot. Defaults to 15.
+        """
+        self.ticker = ticker
+        self.period = period
+        self.smoothing = smoothing
+        self.change = change
+        self.date = None
+        self.recent = deque(maxlen=trail)
+        self.bars = 0
+        self.first = None
+        self.base = None
+        self.ratio = RollingWindow(period)
+        self.ratioSMA = RollingWindow(smoothing)
+        self.strength = deque(maxlen=change + 1)
+        self.chg = RollingWindow(period)
+        self.momentumSMA = RollingWindow(smoothing)
+        self.relativeStrength = nan
+        self.momentum = nan
+        return
+    
+    @classmethod
+    def fromHistory(cls, ticker: str, sector: pd.Series, benchmark: pd.Series, dates: List[str] = None,
+                    **kwargs) -> 'StreamingRelativeRotation':
+        """Primes a calculator with existing price history
+
+        Args:
+            ticker (str): Symbol for sector
+            sector (pd.Series): Sector price data
+            benchmark (pd.Series): Market benchmark price data
+            dates (List[str], optional): Date of every bar. Defaults to None.
+            **kwargs: Args to be passed to the constructor
+
+        Returns:
+            StreamingRelativeRotation: Calculator up to date with the last bar
+        """
+        stream = cls(ticker, **kwargs)
+        dates = [None] * len(sector) if dates is None else dates
+        for price, marketPrice, date in zip(sector.to_numpy(dtype=float), benchmark.to_numpy(dtype=float), dates):
+            stream.update(price, marketPrice, date)
+        return stream
+    
+    def update(self, price: float, marketPrice: float, date: str = None) -> Tuple[float, float]:
+        """Adds the next close
+
+        Args:
+            price (float): Sector close
+            marketPrice (float): Market benchmark close
+            date (str, optional): Date of the bar, kept to know which bars were already added. Defaults to None.
+
+        Returns:
+            float: JdK RS-Ratio after the bar
+            float: JdK RS-Momentum after the bar
+        """
+        self.date = date
+        if(self.first is None and self.base is None):
+            self.first = (price, marketPrice)
+            return self.relativeStrength, self.momentum
+        
+        if(self.base is None): # RelativeRotation indexes from the second close
+            self.base = (price, marketPrice)
+            self._step(*self.first)
+            self.first = None
+        
+        self._step(price, marketPrice)
+        return self.relativeStrength, self.momentum
+    
+    def preview(self, price: float, marketPrice: float) -> Tuple[float, float]:
+        """Values if the given prices were the next close, without storing them.
+            Used for intraday quotes.
+
+        Args:
+            price (float): Sector price
+            marketPrice (float): Market benchmark price
+
+        Returns:
+            float: JdK RS-Ratio
+            float: JdK RS-Momentum
+        """
+        return deepcopy(self).update(price, marketPrice)
+    
+    def _step(self, price: float, marketPrice: float) -> None:
+        """Advances every window by one bar
+
+        Args:
+            price (float): Sector close
+            marketPrice (float): Market benchmark close
+        """
+        ratio = 100 * (price / self.base[0]) / (marketPrice / self.base[1])
+        t = self.bars
+        
+        normalized = self.ratio.zScore(ratio) if t >= self.period else nan
+        self.ratio.push(ratio)
+        self.ratioSMA.push(normalized)
+        strength = self.ratioSMA.mean()
+        self.relativeStrength = strength
+        
+        if(np.isnan(strength) and len(self.strength) > 0): # pct_change pads missing values
+            strength = self.strength[-1]
+        self.strength.append(strength)
+        chg = self.strength[-1] / self.strength[0] - 1 if len(self.strength) > self.change else nan
+        
+        normalized = self.chg.zScore(chg) if t >= 2 * self.period else nan
+        self.chg.push(chg)
+        self.momentumSMA.push(normalized)
+        self.momentum = self.momentumSMA.mean()
+        
+        self.recent.append((self.relativeStrength, self.momentum))
+        self.bars += 1
+        return
+    
+    def getState(self) -> dict:
+        """Serializable calculator state
+
+        Returns:
+            dict: Everything needed to resume updating
+        """
+        return {'ticker': self.ticker, 'period': self.period, 'smoothing': self.smoothing,
+                'change': self.change, 'trail': self.recent.maxlen, 'date': self.date,
+                'recent': [list(x) for x in self.recent], 'bars': self.bars, 'first': self.first, 'base': self.base,
+                'ratio': self.ratio.getState(), 'ratioSMA': self.ratioSMA.getState(),
+                'strength': list(self.strength), 'chg': self.chg.getState(),
+                'momentumSMA': self.momentumSMA.getState(),
+                'relativeStrength': self.relativeStrength, 'momentum': self.momentum}
+    
+    @classmethod
+    def fromState(cls, state: dict) -> 'StreamingRelativeRotation':
+        """Rebuilds a calculator from getState output
+
+        Args:
+            state (dict): Calculator state
+
+        Returns:
+            StreamingRelativeRotation: Restored calculator
+        """
+        stream = cls(state['ticker'], state['period'], state['smoothing'], state['change'], state['trail'])
+        stream.date = state['date']
+        stream.recent.extend(tuple(x) for x in state['recent'])
+        stream.bars = state['bars']
+        stream.first = None if state['first'] is None else tuple(state['first'])
+        stream.base = None if state['base'] is None else tuple(state['base'])
+        for key in ['ratio', 'ratioSMA', 'chg', 'momentumSMA']:
+            setattr(stream, key, RollingWindow.fromState(state[key]))
+        stream.strength.extend(state['strength'])
+        stream.relativeStrength = state['relativeStrength']
+        stream.momentum = state['momentum']
+        return stream
+    
+    def save(self, file: str) -> None:
+        """Writes the calculator state to a json file. The file is replaced in one step
+            so an interrupted run never leaves half a state behind.
+
+        Args:
+            file (str): Path to file
+        """
+        tmp = file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.getState(), f)
+        os.replace(tmp, file)
+        return
+    
+    @classmethod
+    def load(cls, file: str) -> 'StreamingRelativeRotation':
+        """Reads a calculator saved with save
+
+        Args:
+            file (str): Path to file
+
+        Returns:
+            StreamingRelativeRotation: Restored calculator
+        """
+        with open(file) as f:
+            return cls.fromState(json.load(f))
+
+class RotationStore:
+    """StreamingRelativeRotation calculators kept in a local folder as <symbol>.json,
+        so a daily run only adds the bars completed since the last one
+    """
+    def __init__(self, directory: str, **kwargs) -> None:
+        """Creates the folder if needed
+
+        Args:
+            directory (str): Folder for the state files
+            **kwargs: Args to be passed to the StreamingRelativeRotation constructor
+        """
+        self.directory = directory
+        self.kwargs = kwargs
+        os.makedirs(directory, exist_ok=True)
+        return
+    
+    def _path(self, ticker: str) -> str:
+        """State file of a sector
+
+        Args:
+            ticker (str): Symbol for sector
+
+        Returns:
+            str: Path to file
+        """
+        return os.path.join(self.directory, ticker + '.json')
+    
+    def _load(self, ticker: str) -> StreamingRelativeRotation:
+        """Reads a saved calculator
+
+        Args:
+            ticker (str): Symbol for sector
+
+        Returns:
+            StreamingRelativeRotation: Saved calculator. None if there is none or it was built with other parameters.
+        """
+        if(not os.path.exists(self._path(ticker))): return
+        stream = StreamingRelativeRotation.load(self._path(ticker))
+        expected = StreamingRelativeRotation(ticker, **self.kwargs)
+        for key in ['period', 'smoothing', 'change']:
+            if(getattr(stream, key) != getattr(expected, key)): return
+        if(stream.recent.maxlen != expected.recent.maxlen): return
+        return stream
+    
+    def update(self, ticker: str, sector: pd.Series, benchmark: pd.Series, dates: List[str]) -> StreamingRelativeRotation:
+        """Brings a sector's calculator up to date with completed closes and saves it.
+            Only the bars after the saved one are added, the full history is streamed
+            when there is no usable state or the saved bar is not among the dates.
+            Values do not depend on where the history starts once the windows are full,
+            so a state built from an older 10 year window stays valid.
+
+        Args:
+            ticker (str): Symbol for sector
+            sector (pd.Series): Sector closes, completed bars only
+            benchmark (pd.Series): Market benchmark closes on the same days
+            dates (List[str]): Date of every bar
+
+        Returns:
+            StreamingRelativeRotation: Calculator as of the last bar
+        """
+        stream = self._load(ticker)
+        if(stream is None or stream.date not in dates):
+            stream = StreamingRelativeRotation.fromHistory(ticker, sector, benchmark, dates, **self.kwargs)
+        else:
+            start = dates.index(stream.date) + 1
+            for price, marketPrice, date in zip(sector.to_numpy(dtype=float)[start:],
+                                                benchmark.to_numpy(dtype=float)[start:], dates[start:]):
+                stream.update(price, marketPrice, date)
+        stream.save(self._path(ticker))
+        return stream
+
+class LiveRotation(RelativeRotation):
+    """Today's relative rotation of a sector previewed from a streaming calculator.
+        Stands in for RelativeRotation in the live run, its relativeStrength and
+        momentum only hold the last few days ending with today.
+    """
+    def __init__(self, stream: StreamingRelativeRotation, sector: pd.Series, marketPrice: float) -> None:
+        """Previews today's values without changing the calculator
+
+        Args:
+            stream (StreamingRelativeRotation): Calculator up to date with the completed bars
+            sector (pd.Series): Sector closes ending with today's price
+            marketPrice (float): Today's market benchmark price
+        """
+        self.ticker = stream.ticker
+        self.prices = sector
+        self.period = stream.period
+        self.smoothing = stream.smoothing
+        self.change = stream.change
+        
+        today = stream.preview(sector.iloc[-1], marketPrice)
+        recent = list(stream.recent)[1 - stream.recent.maxlen:] + [today]
+        self.relativeStrength = pd.Series([x[0] for x in recent])
+        self.momentum = pd.Series([x[1] for x in recent])
+        return
+
+class PriceMatrix:
+    """Daily closes of every symbol aligned on date in one contiguous [symbols x days]
+        float64 array. Rows are handed out as views so nothing downstream copies them.
+    """
+    def __init__(self, symbols: List[str], dates: np.ndarray, values: np.ndarray) -> None:
+        """Stores the aligned closes
+
+        Args:
+            symbols (List[str]): Symbol of each row
+            dates (np.ndarray): Date of each column
+            values (np.ndarray): Closes, shape [symbols x days]
+        """
+        self.symbols = list(symbols)
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        return
+
+    @classmethod
+    def fromHistories(cls, histories: dict) -> 'PriceMatrix':
+        """Aligns price histories on the dates every symbol has a bar for. A bar missing
+            from one symbol drops that date for all of them instead of shifting the
+            series out of step with each other.
+
+        Args:
+            histories (dict): Symbol: DataFrame with 'Date' and 'Close' columns
+
+        Returns:
+            PriceMatrix: Aligned closes
+        """
+        dates = {}
+        for symbol, history in histories.items():
+            dates[symbol] = pd.to_datetime(history['Date']).to_numpy().astype('datetime64[D]')
+        common = reduce(np.intersect1d, dates.values())
+        
+        values = np.empty((len(histories), len(common)))
+        for i, (symbol, history) in enumerate(histories.items()):
+            _, rows, _ = np.intersect1d(dates[symbol], common, return_indices=True)
+            values[i] = history['Close'].to_numpy(dtype=float)[rows]
+        return cls(histories.keys(), common, values)
+
+    def appendDay(self, date: str, closes: dict) -> 'PriceMatrix':
+        """Adds a day of closes, eg: today's last prices. Days on or after the date are
+            dropped first, so a partial daily bar for today is replaced instead of kept
+            as a completed close.
+
+        Args:
+            date (str): Date of the closes eg: '2022/01/14'
+            closes (dict): Symbol: close for every symbol in the matrix
+
+        Returns:
+            PriceMatrix: New matrix ending with the day
+        """
+        day = np.datetime64(pd.Timestamp(date).date(), 'D')
+        keep = np.searchsorted(self.dates, day, side='left')
+        column = np.array([closes[symbol] for symbol in self.symbols], dtype=np.float64)
+        return PriceMatrix(self.symbols, np.append(self.dates[:keep], day),
+                           np.column_stack((self.values[:, :keep], column)))
+
+    def __len__(self) -> int:
+        """Number of days
+
+        Returns:
+            int: Days in the matrix
+        """
+        return len(self.dates)
+
+    def row(self, symbol: str) -> np.ndarray:
+        """Closes of a symbol
+
+        Args:
+            symbol (str): Symbol for asset
+
+        Returns:
+            np.ndarray: View of the symbol's row
+        """
+        return self.values[self.index[symbol]]
+
+    def series(self, symbol: str) -> pd.Series:
+        """Closes of a symbol as a series without copying them
+
+        Args:
+            symbol (str): Symbol for asset
+
+        Returns:
+            pd.Series: Closes backed by the matrix
+        """
+        return pd.Series(self.row(symbol), copy=False)
+
 class Data:
     """Base class to grab data without requiring initialization
     """
-    def __init__(self, TDSession: TDClient) -> None:
+    def __init__(self, TDSession: TDClient, provider: PriceProvider = None, priceDir: str = PRICE_DIR) -> None:
         """Allows ticker grab without building RelativeRotation.
 
         Args:
             TDSession (TDClient): Authenticated TD API object.
+            provider (PriceProvider, optional): Source of daily closes. Defaults to the TD API.
+            priceDir (str, optional): Folder of the local price store. Defaults to PRICE_DIR, None to use the provider directly.
         """
         self.TDSession = TDSession
+        self.quotes = getQuoteSnapshot(TDSession)
+        provider = provider or TDPriceProvider(TDSession)
+        self.store = PriceStore(priceDir, provider) if priceDir else provider
         return
     
     def getTickers(self) -> dict:
@@ -193,7 +821,7 @@ class Data:
         return {'tickers': tickers, 'comp': MARKET_INDEX}
     
     def getLastPrice(self, symbol: str) -> float:
-        """Gets most recent traded price for asset
+        """Gets most recent traded price for asset from the session's quote snapshot
 
         Args:
             symbol (str): Ticker
@@ -201,61 +829,80 @@ class Data:
         Returns:
             float: Price in dollars
         """
-        return self.TDSession.get_quotes([symbol])[symbol]['lastPrice']
+        return self.quotes.getLastPrice(symbol)
     
-    def getPrices(self, symbol: str) -> pd.Series:
-        """Gets daily price data for last 10 years
+    def getPriceHistory(self, symbol: str) -> pd.DataFrame:
+        """Gets daily closes for the last 10 years from the local price store,
+            which only downloads bars it does not have yet. Without a price
+            folder the provider is used directly.
 
         Args:
             symbol (str): Symbol for asset
 
         Returns:
-            pd.Series: Daily close price data
+            pd.DataFrame: 'Date' and 'Close' columns
         """
-        ohlc = self.TDSession.get_price_history(symbol = symbol, period_type='year', period=10, frequency_type='daily', frequency=1, extended_hours=False)
-        close = []
-        for day in ohlc['candles']:
-            close.append(day['close'])
-        
-        close.append(self.getLastPrice(symbol))
-        
-        return pd.Series(close)
+        return self.store.getPriceHistory(symbol)
 
 class SetupRR(Data):
     """Pulls market data and creates RelativeRotation objects
     """
-    def __init__(self, TDSession: TDClient, **kwargs) -> None:
-        """Sets up relative rotation objects. Limits price data to shortest history
-                or 10 years, whichever is smaller.
+    def __init__(self, TDSession: TDClient, provider: PriceProvider = None, workers: int = 8, appendQuotes: bool = True,
+                 stateDir: str = None, priceDir: str = PRICE_DIR, **kwargs) -> None:
+        """Sets up relative rotation objects. Limits price data to the dates every symbol
+                has a bar for within the last 10 years. Histories are fetched concurrently
+                and the latest prices with a single quote request. Closes are kept in matrix
+                and the date of each day in dates. With a state folder and today's prices,
+                the values come from saved streaming calculators, see RotationStore. History
+                bars dated today or later are replaced by today's prices, so only completed
+                bars are ever streamed into the saved states.
 
         Args:
             TDSession (TDClient): Authenticated API connection object
+            provider (PriceProvider, optional): Source of daily closes. Defaults to the TD API.
+            workers (int, optional): Maximum price history requests in flight. Defaults to 8.
+            appendQuotes (bool, optional): Add today's last prices as the final day. Defaults to True,
+                                            backtests only use completed bars.
+            stateDir (str, optional): Folder for the streaming calculator states. Defaults to None,
+                                       every RelativeRotation is computed from the full history.
+            priceDir (str, optional): Folder of the local price store. Defaults to PRICE_DIR.
             **kwargs: Args to be passed to relative rotation contructor
         """
-        self.TDSession = TDSession
+        super().__init__(TDSession, provider, priceDir)
         tickers = self.getTickers()
         self.sectors = tickers['tickers']
         self.market = tickers['comp']
         self.rr = []
         
-        prices = []
-        for sector in self.sectors:
-            prices.append(self.getPrices(sector))
-        
-        prices.append(self.getPrices(self.market))
-        shortestPriceHistory = min(list(map(len, prices)))
-        
-        shortPrices = []
-        for stock in prices:
-            ind = len(stock) - shortestPriceHistory
-            stock = stock[ind:]
-            stock.reset_index(inplace=True, drop=True)
-            shortPrices.append(stock)
+        symbols = self.sectors + [self.market]
+        histories = fetchConcurrently(self.getPriceHistory, symbols, workers)
+        self.matrix = PriceMatrix.fromHistories(histories)
+        if(appendQuotes):
+            self.quotes.prefetch(symbols + [VOL_INDEX])
+            lastPrices = {symbol: self.getLastPrice(symbol) for symbol in symbols}
+            self.matrix = self.matrix.appendDay(datetime.now().strftime("%Y/%m/%d"), lastPrices)
+        self.dates = pd.to_datetime(self.matrix.dates).strftime("%Y/%m/%d").tolist()
         
-        for i in range(len(self.sectors)):
-            self.rr.append(RelativeRotation(self.sectors[i], shortPrices[i], shortPrices[-1], **kwargs))
+        store = RotationStore(stateDir, **kwargs) if stateDir and appendQuotes else None
+        for sector in self.sectors:
+            closes = self.matrix.series(sector)
+            market = self.matrix.series(self.market)
+            if(store is None):
+                self.rr.append(RelativeRotation(sector, closes, market, **kwargs))
+            else:
+                stream = store.update(sector, closes[:-1], market[:-1], self.dates[:-1])
+                self.rr.append(LiveRotation(stream, closes, market.iloc[-1]))
         return
     
+    def getQuadrants(self) -> np.ndarray:
+        """Quadrant of every sector on every day
+
+        Returns:
+            np.ndarray: Shape [sectors x days], see quadrantMatrix
+        """
+        return quadrantMatrix(np.vstack([x.relativeStrength.to_numpy() for x in self.rr]),
+                              np.vstack([x.momentum.to_numpy() for x in self.rr]))
+    
     def getRR(self) -> list:
         """Stores all RelativeRotation objects
 
@@ -264,15 +911,113 @@ class SetupRR(Data):
         """
         return self.rr
 
+class Ledger:
+    """Column store for the position tracker. Rows are appended to per column
+        buffers and a DataFrame is only built when asked for.
+    """
+    def __init__(self, columns: List[str]) -> None:
+        """Creates an empty ledger
+
+        Args:
+            columns (List[str]): Column names in order
+        """
+        self.columns = list(columns)
+        self.data = {column: [] for column in self.columns}
+        self.rows = 0
+        self._frame = None
+        return
+    
+    @classmethod
+    def fromDataFrame(cls, df: pd.DataFrame) -> 'Ledger':
+        """Loads an existing table
+
+        Args:
+            df (pd.DataFrame): Table to copy
+
+        Returns:
+            Ledger: Ledger with the same columns and rows
+        """
+        ledger = cls(df.columns)
+        for column in ledger.columns:
+            ledger.data[column] = df[column].tolist()
+        ledger.rows = df.shape[0]
+        return ledger
+    
+    def __len__(self) -> int:
+        """Number of rows
+
+        Returns:
+            int: Rows in the ledger
+        """
+        return self.rows
+    
+    def append(self, row: dict) -> None:
+        """Adds a row
+
+        Args:
+            row (dict): Column: value, must contain every column
+        """
+        for column in self.columns:
+            self.data[column].append(row[column])
+        self.rows += 1
+        self._frame = None
+        return
+    
+    def insert(self, loc: int, column: str, value = 0) -> None:
+        """Adds a column filled with a single value
+
+        Args:
+            loc (int): Position of the new column
+            column (str): Column name
+            value (optional): Value for existing rows. Defaults to 0.
+        """
+        self.columns.insert(loc, column)
+        self.data[column] = [value] * self.rows
+        self._frame = None
+        return
+    
+    def last(self, column: str):
+        """Value in the last row
+
+        Args:
+            column (str): Column name
+
+        Returns:
+            Value of the column in the last row
+        """
+        return self.data[column][-1]
+    
+    def setLast(self, column: str, value) -> None:
+        """Overwrites a value in the last row
+
+        Args:
+            column (str): Column name
+            value: New value
+        """
+        self.data[column][-1] = value
+        self._frame = None
+        return
+    
+    def toDataFrame(self) -> pd.DataFrame:
+        """Builds a DataFrame of the ledger, cached until the next change
+
+        Returns:
+            pd.DataFrame: Ledger contents
+        """
+        if(self._frame is None):
+            self._frame = pd.DataFrame(self.data, columns=self.columns)
+        return self._frame
+
 class PositionTracker:
-    def __init__(self, TDSession: TDClient) -> None:
+    def __init__(self, env: 'Environment', verify: bool = False) -> None:
         """Tracks trades and allocations by asset
 
         Args:
-            TDSession (TDClient): Authenticated API connection object
+            env (Environment): Clock, quotes and storage to use, see environment
+            verify (bool, optional): Check the running holdings against the trade log. Defaults to False.
         """
-        self.TDSession = TDSession
-        self.grabber = Data(self.TDSession)
+        self.env = env
+        self.verify = verify
         
         existing = self._getCSVs()
         
@@ -282,30 +1027,104 @@ class PositionTracker:
     def _generateDataFrames(self) -> None:
         """Creates tracking dataframes if there have been no trades ever
         """
-        mult = ACCOUNT_START / self.grabber.getLastPrice(MARKET_INDEX)
+        mult = ACCOUNT_START / self.env.quotes.getLastPrice(MARKET_INDEX)
         
-        self.tracker = pd.DataFrame(columns=['Date', 'Cash', 'Value', 'Benchmark'])
-        self.positions = pd.DataFrame(columns=['Date', 'Cash', 'Value', 'Benchmark'])
+        self._tracker = Ledger(['Date', 'Cash', 'Value', 'Benchmark'])
+        self._positions = Ledger(['Date', 'Cash', 'Value', 'Benchmark'])
         
-        yesterday = datetime.now() - timedelta(days=1)
-        valData = {'Date': yesterday.strftime("%Y/%m/%d"), 'Cash': ACCOUNT_START, 'Value': ACCOUNT_START, 'Benchmark': ACCOUNT_START}
-        posData = {'Date': yesterday.strftime("%Y/%m/%d"), 'Cash': ACCOUNT_START, 'Value': ACCOUNT_START, 'Benchmark': mult}
+        yesterday = self.env.clock.yesterday()
+        valData = {'Date': yesterday, 'Cash': ACCOUNT_START, 'Value': ACCOUNT_START, 'Benchmark': ACCOUNT_START}
+        posData = {'Date': yesterday, 'Cash': ACCOUNT_START, 'Value': ACCOUNT_START, 'Benchmark': mult}
         self.addDay(valData, posData)
         
-        self.trades = pd.DataFrame(columns = ['Date', 'Symbol', 'Quantity', 'Value'])
+        self._trades = Ledger(['Date', 'Symbol', 'Quantity', 'Value'])
+        self.holdings = {}
         return
     
     def _getCSVs(self) -> bool:
-        """Downloads tracker and trades csv from s3
+        """Loads tracker and trades csv from storage
 
         Returns:
-            bool: If all files exist in s3
+            bool: If all files exist
         """
-        self.tracker = s3Download(TRACKER)
-        self.trades = s3Download(TRADES)
-        self.positions = s3Download(POSITIONS)
+        tracker = self.env.storage.load(TRACKER)
+        trades = self.env.storage.load(TRADES)
+        positions = self.env.storage.load(POSITIONS)
+        
+        if(type(None) in [type(tracker), type(trades), type(positions)]): return False
         
-        return type(None) not in [type(self.tracker), type(self.trades), type(self.positions)]
+        self._tracker = Ledger.fromDataFrame(tracker)
+        self._trades = Ledger.fromDataFrame(trades)
+        self._positions = Ledger.fromDataFrame(positions)
+        self.holdings = self._replayTrades()
+        return True
+    
+    @property
+    def tracker(self) -> pd.DataFrame:
+        """Strategy allocations in dollars
+
+        Returns:
+            pd.DataFrame: Tracker table
+        """
+        return self._tracker.toDataFrame()
+    
+    @property
+    def trades(self) -> pd.DataFrame:
+        """Every trade made by the strategy
+
+        Returns:
+            pd.DataFrame: Trades table
+        """
+        return self._trades.toDataFrame()
+    
+    @property
+    def positions(self) -> pd.DataFrame:
+        """Strategy allocations in shares
+
+        Returns:
+            pd.DataFrame: Positions table
+        """
+        return self._positions.toDataFrame()
+    
+    def getColumns(self) -> List[str]:
+        """Columns shared by the tracker and positions tables
+
+        Returns:
+            List[str]: Column names
+        """
+        return list(self._tracker.columns)
+    
+    def _replayTrades(self) -> dict:
+        """Rebuilds share quantities from the full trade log
+
+        Returns:
+            dict: Symbol: quantity
+        """
+        holdings = {}
+        for symbol, quantity in zip(self._trades.data['Symbol'], self._trades.data['Quantity']):
+            holdings[symbol] = holdings.get(symbol, 0) + quantity
+        return holdings
+    
+    def getHoldings(self) -> dict:
+        """Gets share quantities from the running position map kept by logTrade
+
+        Raises:
+            ValueError: If verifying and the map does not match a replay of the trade log
+
+        Returns:
+            dict: Symbol: quantity
+        """
+        if(self.verify and self._replayTrades() != self.holdings):
+            raise ValueError('Running holdings do not match the trade log')
+        return dict(self.holdings)
+    
+    def lastDate(self):
+        """Date of the last row in the tracker
+
+        Returns:
+            Date label of the environment's clock, eg: '2022/01/14' or a backtest day
+        """
+        return self._tracker.last('Date')
 
     def getStrategyValue(self) -> float:
         """Gets current value of the portfolio
@@ -313,13 +1132,17 @@ class PositionTracker:
         Returns:
             float: Value in dollars
         """
+        symbols = [x for x in self._positions.columns if x not in ['Date', 'Cash', 'Value', 'Benchmark']]
+        self.env.quotes.prefetch(symbols)
+        
         strategy = 0
-        for index, value in self.positions.iloc[self.positions.shape[0]-1].iteritems():
+        for index in self._positions.columns:
             if(index in ['Date', 'Value', 'Benchmark']): continue
+            value = self._positions.last(index)
             if(index == 'Cash'):
                 strategy += value
                 continue
-            strategy += value * self.grabber.getLastPrice(index)
+            strategy += value * self.env.quotes.getLastPrice(index)
             
         return strategy
     
@@ -329,7 +1152,7 @@ class PositionTracker:
         Returns:
             float: Cash in dollars
         """
-        return self.tracker.iloc[self.tracker.shape[0] - 1, 1]
+        return self._tracker.last('Cash')
     
     def getMarketMultiplier(self) -> float:
         """Gets the multiplier to convert market index into comparable
@@ -338,7 +1161,7 @@ class PositionTracker:
         Returns:
             float: Multiplier
         """
-        return self.positions.iloc[self.positions.shape[0] - 1, self.positions.shape[1] - 1]
+        return self._positions.last('Benchmark')
     
     def addSymbol(self, symbol: str) -> None:
         """Adds an asset to the tracker. Assumed no allocation in past
@@ -346,17 +1169,14 @@ class PositionTracker:
         Args:
             symbol (str): Ticker for asset
         """
-        self.tracker.insert(2, symbol, [0] * self.tracker.shape[0])
-        self.positions.insert(2, symbol, [0] * self.positions.shape[0])
+        self._tracker.insert(2, symbol)
+        self._positions.insert(2, symbol)
         return
     
     def addColumns(self) -> None:
         """Adds assets in already in storage to allocation tracker
         """
-        grabber = Data(self.TDSession)
-        symbols = grabber.getTickers()['tickers']
-        
-        newSymbols = [x for x in symbols if x not in self.tracker.columns]
+        newSymbols = [x for x in self.env.tickers if x not in self._tracker.columns]
         
         for sym in newSymbols:
             self.addSymbol(sym)
@@ -373,16 +1193,16 @@ class PositionTracker:
         Raises:
             ValueError: If given incorrect keys in data dict
         """
-        if(check(values.keys()) != check(self.tracker.columns)):
-            removedAssets = [x for x in self.tracker.columns if x not in values.keys()]
+        if(check(values.keys()) != check(self._tracker.columns)):
+            removedAssets = [x for x in self._tracker.columns if x not in values.keys()]
             for asset in removedAssets:
                 values[asset] = 0
                 positions[asset] = 0
-            if(check(values.keys()) != check(self.tracker.columns)):
+            if(check(values.keys()) != check(self._tracker.columns)):
                 raise ValueError("Incorrect data keys")
         
-        self.tracker = self.tracker.append(values, ignore_index=True)
-        self.positions = self.positions.append(positions, ignore_index=True)
+        self._tracker.append(values)
+        self._positions.append(positions)
         return
     
     def changeAllocation(self, amount: float) -> None:
@@ -397,13 +1217,13 @@ class PositionTracker:
         value = currentStratValue + amount
         mult = self.getMarketMultiplier() * (value / currentStratValue)
         
-        self.tracker.iloc[self.tracker.shape[0] - 1, 1] = cash
-        self.positions.iloc[self.positions.shape[0] - 1, 1] = cash
+        self._tracker.setLast('Cash', cash)
+        self._positions.setLast('Cash', cash)
         
-        self.tracker.iloc[self.tracker.shape[0] - 1, self.tracker.shape[1] - 2] = value
-        self.positions.iloc[self.positions.shape[0] - 1, self.positions.shape[1] - 2] = value
+        self._tracker.setLast('Value', value)
+        self._positions.setLast('Value', value)
         
-        self.positions.iloc[self.positions.shape[0] - 1, self.positions.shape[1] - 1] = mult
+        self._positions.setLast('Benchmark', mult)
         return
     
     def logTrade(self, data: dict) -> None:
@@ -415,31 +1235,131 @@ class PositionTracker:
         Raises:
             ValueError: If given incorrect data keys
         """
-        if(check(data.keys()) != check(self.trades.columns)):
+        if(check(data.keys()) != check(self._trades.columns)):
             raise ValueError("Incorrect data keys")
         
-        self.trades = self.trades.append(data, ignore_index=True)
+        self._trades.append(data)
+        self.holdings[data['Symbol']] = self.holdings.get(data['Symbol'], 0) + data['Quantity']
         return
     
-    def saveLogs(self, location: str = '') -> None:
-        """Uploads final files to s3 for storage
-        
+    def saveLogs(self) -> None:
+        """Writes the files to storage
+        """
+        self.env.storage.save(self.tracker, TRACKER)
+        self.env.storage.save(self.trades, TRADES)
+        self.env.storage.save(self.positions, POSITIONS)
+        return
+
+class RiskFreeRate:
+    """Zero coupon bond yields kept in a local date keyed csv so the
+        dataset is downloaded at most once per ttl. Without a cache file
+        they are only kept in memory.
+    """
+    def __init__(self, cache: str = RFR_CACHE, ttl: timedelta = timedelta(hours=20), offline: bool = False) -> None:
+        """Creates the rate provider
+
         Args:
-            location (str): Pre-path to file
+            cache (str, optional): Path to csv cache. Defaults to RFR_CACHE, None to not write a file.
+            ttl (timedelta, optional): Age after which the cache is refreshed. Defaults to 20 hours.
+            offline (bool, optional): Never download, only read the cache. Defaults to False.
         """
-        self.tracker.to_csv(location + TRACKER, index=False)
-        self.trades.to_csv(location + TRADES, index=False)
-        self.positions.to_csv(location + POSITIONS, index=False)
-        s3Upload(location + TRACKER)
-        s3Upload(location + TRADES)
-        s3Upload(location + POSITIONS)
+        self.cache = cache
+        self.ttl = ttl
+        self.offline = offline
+        self.rates = None
+        self.loaded = None
         return
+    
+    def _fresh(self) -> bool:
+        """Checks if the cache file is younger than the ttl
+
+        Returns:
+            bool: If the cache can be used without downloading
+        """
+        if(not self.cache or not os.path.exists(self.cache)): return False
+        age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(self.cache))
+        return age < self.ttl
+    
+    def _cached(self) -> bool:
+        """Checks if there is a cache file, however old
+
+        Returns:
+            bool: If the cache can be read
+        """
+        return bool(self.cache) and os.path.exists(self.cache)
+    
+    def _read(self) -> pd.Series:
+        """Reads the cache file
+
+        Returns:
+            pd.Series: Rates indexed by date
+        """
+        rates = pd.read_csv(self.cache, index_col='Date', parse_dates=['Date'])['Rate']
+        return rates.sort_index()
+    
+    def _download(self) -> pd.Series:
+        """Downloads the yield curve and writes the one year yields to the cache if there is one.
+            The file is replaced in one step so readers never see a partial cache.
+
+        Returns:
+            pd.Series: Rates indexed by date
+        """
+        rates = quandl.get("FED/SVENY", authtoken=NQ_API_KEY)["SVENY01"].dropna() / 100
+        rates.index.name = 'Date'
+        if(self.cache):
+            tmp = self.cache + '.' + str(os.getpid()) + '.tmp'
+            rates.rename('Rate').to_csv(tmp)
+            os.replace(tmp, self.cache)
+        return rates.sort_index()
+    
+    def getRates(self) -> pd.Series:
+        """Gets every cached rate, downloading them if the cache is stale. Falls back
+            to the stale cache if the download fails.
+
+        Returns:
+            pd.Series: Rates indexed by date
+        """
+        if(self.rates is not None and datetime.now() - self.loaded < self.ttl): return self.rates
+        
+        if(self._fresh()):
+            self.rates = self._read()
+        elif(self.offline):
+            if(not self._cached()): raise FileNotFoundError('No risk free rate cache to read offline: ' + str(self.cache))
+            self.rates = self._read()
+        else:
+            try:
+                self.rates = self._download()
+            except Exception:
+                if(not self._cached()): raise
+                self.rates = self._read()
+        self.loaded = datetime.now()
+        return self.rates
+    
+    def getRate(self, date: str = None) -> float:
+        """Gets the risk free rate on a date
+
+        Args:
+            date (str, optional): Date eg: '2022/01/14'. Defaults to the latest rate.
+
+        Returns:
+            float: Latest rate published on or before the date
+        """
+        rates = self.getRates()
+        if(date is None): return rates.iloc[-1]
+        i = max(rates.index.searchsorted(pd.Timestamp(date), side='right') - 1, 0)
+        return rates.iloc[i]
+
+riskFree = None
+
+def getRiskFreeRate(date: str = None) -> float:
+    """Gets risk free rate from zero coupon bond yield curve, see RiskFreeRate
 
-def getRiskFreeRate() -> float:
-    """Gets risk free rate from zero coupon bond yield curve
+    Args:
+        date (str, optional): Date eg: '2022/01/14'. Defaults to the latest rate.
 
     Returns:
         float: Risk free rate
     """
-    rates = quandl.get("FED/SVENY", authtoken=NQ_API_KEY)
-    return rates.iloc[rates.shape[0] - 1]["SVENY01"] / 100
+    global riskFree
+    if(riskFree is None): riskFree = RiskFreeRate()
+    return riskFree.getRate(date)
\ No newline at end of file
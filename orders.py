@@ -0,0 +1,293 @@
+# Relative Rotation Swing Trading Algorithm
+# Copyright (C) 2022  Shaurya Tathgir
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from time import monotonic, sleep
+from typing import Dict, List
+
+from td.client import TDClient
+
+from config import TD_ACCOUNT
+from prices import withBackoff
+
+FILLED = 'filled'
+PARTIAL = 'partial'
+REJECTED = 'rejected'
+EXPIRED = 'expired'
+
+TERMINAL = ['FILLED', 'REJECTED', 'CANCELED', 'EXPIRED', 'REPLACED'] # Broker states an order can not leave
+
+
+@dataclass
+class OrderResult:
+    """Outcome of one order
+    """
+    symbol: str
+    requested: int
+    filled: int
+    price: float
+    status: str
+    orderId: str = None
+
+class OrderExecutor:
+    """Places market orders and tracks their fills concurrently. Sells are executed
+        before buys so their proceeds are available.
+    """
+    def __init__(self, TDSession: TDClient, account: str = TD_ACCOUNT, timeout: float = 60, poll: float = 0.5,
+                 maxPoll: float = 8, workers: int = 8) -> None:
+        """Creates the executor
+
+        Args:
+            TDSession (TDClient): Authenticated API connection object
+            account (str, optional): Account to trade in. Defaults to TD_ACCOUNT.
+            timeout (float, optional): Seconds an order may stay open before it is cancelled. Defaults to 60.
+            poll (float, optional): Seconds before the first status check. Defaults to 0.5.
+            maxPoll (float, optional): Longest wait between status checks, the wait doubles up to it. Defaults to 8.
+            workers (int, optional): Orders tracked at once. Defaults to 8.
+        """
+        self.TDSession = TDSession
+        self.account = account
+        self.timeout = timeout
+        self.poll = poll
+        self.maxPoll = maxPoll
+        self.workers = workers
+        return
+
+    def _order(self, symbol: str, quantity: int) -> dict:
+        """Builds a market order
+
+        Args:
+            symbol (str): Ticker for asset
+            quantity (int): Number of shares. Negative if sale. Must be non-zero.
+
+        Returns:
+            dict: Order payload
+        """
+        return {
+                "orderType": "MARKET",
+                "session": "NORMAL",
+                "duration": "DAY",
+                "orderStrategyType": "SINGLE",
+                "orderLegCollection": [
+                    {
+                        "instruction": "sell" if quantity < 0 else "buy",
+                        "quantity": abs(int(quantity)),
+                        "instrument": {
+                            "symbol": symbol,
+                            "assetType": "EQUITY"
+                        }
+                    }
+                ]
+            }
+
+    def _getOrder(self, orderId: str) -> dict:
+        """Reads an order, retrying when the request limit is exceeded
+
+        Args:
+            orderId (str): Broker order id
+
+        Returns:
+            dict: Order
+        """
+        return withBackoff(lambda x: self.TDSession.get_orders(account=self.account, order_id=x), orderId)
+
+    def _fills(self, order: dict) -> tuple:
+        """Filled quantity and average execution price of an order
+
+        Args:
+            order (dict): Order from the broker
+
+        Returns:
+            int: Shares filled
+            float: Average price, None if nothing filled
+        """
+        executed = 0
+        cost = 0
+        for activity in order.get('orderActivityCollection', []):
+            for leg in activity.get('executionLegs', []):
+                executed += leg['quantity']
+                cost += leg['quantity'] * leg['price']
+        shares = int(order.get('filledQuantity', executed))
+        return shares, (cost / executed if executed else None)
+
+    def _classify(self, order: dict, quantity: int, filled: int) -> str:
+        """Terminal state of an order
+
+        Args:
+            order (dict): Order from the broker
+            quantity (int): Shares requested
+            filled (int): Shares filled
+
+        Returns:
+            str: FILLED, PARTIAL, REJECTED or EXPIRED
+        """
+        if(filled >= abs(quantity)): return FILLED
+        if(filled > 0): return PARTIAL
+        if(order.get('status') == 'REJECTED'): return REJECTED
+        return EXPIRED
+
+    def _abandon(self, orderId: str, order: dict) -> dict:
+        """Cancels an order that could not be tracked and reads its final state
+
+        Args:
+            orderId (str): Broker order id
+            order (dict): Last state read of the order
+
+        Returns:
+            dict: Order after the cancel, or the last state read if the broker can not be reached
+        """
+        try:
+            self.TDSession.cancel_order(account=self.account, order_id=orderId)
+        except Exception:
+            pass
+        try:
+            return self._getOrder(orderId)
+        except Exception:
+            return order
+
+    def _track(self, symbol: str, quantity: int, orderId: str) -> OrderResult:
+        """Polls an order with exponential backoff until it reaches a terminal state or
+            times out, in which case the rest of it is cancelled. A failed request also
+            cancels the rest, so one broken connection never aborts the other orders.
+
+        Args:
+            symbol (str): Ticker for asset
+            quantity (int): Number of shares. Negative if sale.
+            orderId (str): Broker order id
+
+        Returns:
+            OrderResult: Outcome
+        """
+        deadline = monotonic() + self.timeout
+        wait = self.poll
+        order = {}
+        try:
+            while True:
+                sleep(min(wait, max(deadline - monotonic(), 0)))
+                order = self._getOrder(orderId)
+                if(order.get('status') in TERMINAL or order.get('remainingQuantity') == 0): break
+                if(monotonic() >= deadline):
+                    self.TDSession.cancel_order(account=self.account, order_id=orderId)
+                    order = self._getOrder(orderId)
+                    break
+                wait = min(wait * 2, self.maxPoll)
+        except Exception:
+            order = self._abandon(orderId, order)
+
+        filled, price = self._fills(order)
+        sign = -1 if quantity < 0 else 1
+        return OrderResult(symbol, quantity, sign * filled, price, self._classify(order, quantity, filled), orderId)
+
+    def _place(self, symbol: str, quantity: int) -> OrderResult:
+        """Submits an order and waits for its outcome
+
+        Args:
+            symbol (str): Ticker for asset
+            quantity (int): Number of shares. Negative if sale.
+
+        Returns:
+            OrderResult: Outcome
+        """
+        try:
+            resp = self.TDSession.place_order(account=self.account, order=self._order(symbol, quantity))
+        except Exception:
+            return OrderResult(symbol, quantity, 0, None, REJECTED)
+        if(not resp.get('order_id')): return OrderResult(symbol, quantity, 0, None, REJECTED)
+        return self._track(symbol, quantity, resp['order_id'])
+
+    def getPositions(self, symbols: List[str]) -> dict:
+        """Gets share quantities held in the account
+
+        Args:
+            symbols (List[str]): Symbols of interest
+
+        Returns:
+            dict: Symbol: quantity, 0 if not held
+        """
+        holdings = self.TDSession.get_accounts(account = self.account,
+                                               fields=['positions'])['securitiesAccount']['positions']
+        current = {symbol: 0 for symbol in symbols}
+        for position in holdings:
+            if(position['instrument']['symbol'] in current):
+                current[position['instrument']['symbol']] = position['longQuantity']
+        return current
+
+    def execute(self, numShares: dict) -> Dict[str, OrderResult]:
+        """Places every non-zero trade. All sells are placed and tracked together, then all buys.
+            Every trade gets an outcome, even when the broker fails while it is tracked.
+
+        Args:
+            numShares (dict): Symbol: trade quantity, negative if sale
+
+        Returns:
+            Dict[str, OrderResult]: Symbol: outcome
+        """
+        results = {}
+        sells = {x: int(q) for x, q in numShares.items() if int(q) < 0}
+        buys = {x: int(q) for x, q in numShares.items() if int(q) > 0}
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            for legs in [sells, buys]:
+                futures = {x: pool.submit(self._place, x, q) for x, q in legs.items()}
+                for symbol, future in futures.items():
+                    try:
+                        results[symbol] = future.result()
+                    except Exception:
+                        results[symbol] = OrderResult(symbol, legs[symbol], 0, None, EXPIRED)
+        return results
+
+class InstantExecutor:
+    """Fills every trade in full at the last price as soon as it is placed, for backtests
+    """
+    def __init__(self, quotes, positions: dict = None) -> None:
+        """Creates the venue
+
+        Args:
+            quotes: Price source with getLastPrice, eg: environment.MatrixQuotes
+            positions (dict, optional): Symbol: quantity already held, eg: from a resumed book. Defaults to None.
+        """
+        self.quotes = quotes
+        self.positions = dict(positions or {})
+        return
+
+    def getPositions(self, symbols: List[str]) -> dict:
+        """Gets share quantities held
+
+        Args:
+            symbols (List[str]): Symbols of interest
+
+        Returns:
+            dict: Symbol: quantity, 0 if not held
+        """
+        return {symbol: self.positions.get(symbol, 0) for symbol in symbols}
+
+    def execute(self, numShares: dict) -> Dict[str, OrderResult]:
+        """Fills every non-zero trade
+
+        Args:
+            numShares (dict): Symbol: trade quantity, negative if sale
+
+        Returns:
+            Dict[str, OrderResult]: Symbol: outcome
+        """
+        results = {}
+        for symbol, quantity in numShares.items():
+            if(int(quantity) == 0): continue
+            self.positions[symbol] = self.positions.get(symbol, 0) + quantity
+            results[symbol] = OrderResult(symbol, quantity, quantity, self.quotes.getLastPrice(symbol), FILLED)
+        return results
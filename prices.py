@@ -0,0 +1,334 @@
+# Relative Rotation Swing Trading Algorithm
+# Copyright (C) 2022  Shaurya Tathgir
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
+
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from time import sleep
+from typing import Callable, Iterable, List, Tuple
+from weakref import WeakKeyDictionary
+
+import numpy as np
+import pandas as pd
+from td.client import TDClient
+from td.exceptions import ExdLmtError
+
+BARS = np.dtype([('date', 'datetime64[D]'), ('close', 'f8')])
+
+_snapshots = WeakKeyDictionary()
+
+
+class PriceProvider:
+    """Source of daily closes for PriceStore
+    """
+    def getPriceHistory(self, symbol: str, start: str = None) -> pd.DataFrame:
+        """Gets daily closes
+
+        Args:
+            symbol (str): Symbol for asset
+            start (str, optional): First date to return eg: '2022/01/14'. Defaults to None, last 10 years.
+
+        Returns:
+            pd.DataFrame: 'Date' and 'Close' columns, oldest first
+        """
+        raise NotImplementedError
+
+class TDPriceProvider(PriceProvider):
+    """Daily closes from the TD price history endpoint
+    """
+    def __init__(self, TDSession: TDClient) -> None:
+        """Stores API object
+
+        Args:
+            TDSession (TDClient): Authenticated API connection object
+        """
+        self.TDSession = TDSession
+        return
+
+    def getPriceHistory(self, symbol: str, start: str = None) -> pd.DataFrame:
+        """Gets daily closes
+
+        Args:
+            symbol (str): Symbol for asset
+            start (str, optional): First date to return eg: '2022/01/14'. Defaults to None, last 10 years.
+
+        Returns:
+            pd.DataFrame: 'Date' and 'Close' columns, oldest first
+        """
+        if(start is None):
+            ohlc = self.TDSession.get_price_history(symbol = symbol, period_type='year', period=10, frequency_type='daily',
+                                                    frequency=1, extended_hours=False)
+        else:
+            startDate = int(pd.Timestamp(start).timestamp() * 1000)
+            endDate = int(datetime.now().timestamp() * 1000)
+            ohlc = self.TDSession.get_price_history(symbol = symbol, period_type='year', start_date=startDate, end_date=endDate,
+                                                    frequency_type='daily', frequency=1, extended_hours=False)
+        dates = []
+        close = []
+        for day in ohlc['candles']:
+            dates.append(datetime.fromtimestamp(day['datetime'] / 1000).strftime("%Y/%m/%d"))
+            close.append(day['close'])
+        return pd.DataFrame({'Date': dates, 'Close': close})
+
+class LocalPriceProvider(PriceProvider):
+    """Daily closes from csv files named <symbol>.csv with 'Date' and 'Close' columns.
+        Used as a fixture in place of the TD API.
+    """
+    def __init__(self, directory: str) -> None:
+        """Stores location of the files
+
+        Args:
+            directory (str): Folder with one csv per symbol
+        """
+        self.directory = directory
+        return
+
+    def getPriceHistory(self, symbol: str, start: str = None) -> pd.DataFrame:
+        """Gets daily closes
+
+        Args:
+            symbol (str): Symbol for asset
+            start (str, optional): First date to return eg: '2022/01/14'. Defaults to None, every bar.
+
+        Returns:
+            pd.DataFrame: 'Date' and 'Close' columns, oldest first
+        """
+        bars = pd.read_csv(os.path.join(self.directory, symbol + '.csv'))
+        if(start is not None):
+            bars = bars[pd.to_datetime(bars['Date']) >= pd.Timestamp(start)]
+        return bars[['Date', 'Close']].reset_index(drop=True)
+
+class PriceStore:
+    """Keeps one memory mappable .npy file of daily closes per symbol and only asks
+        the provider for bars newer than the last stored date
+    """
+    def __init__(self, directory: str, provider: PriceProvider, years: int = 10) -> None:
+        """Creates the store
+
+        Args:
+            directory (str): Folder for the .npy files
+            provider (PriceProvider): Source of new bars
+            years (int, optional): History returned by getPriceHistory. Defaults to 10.
+        """
+        self.directory = directory
+        self.provider = provider
+        self.years = years
+        os.makedirs(directory, exist_ok=True)
+        return
+
+    def _path(self, symbol: str) -> str:
+        """Location of a symbol's file
+
+        Args:
+            symbol (str): Symbol for asset
+
+        Returns:
+            str: Path to file
+        """
+        return os.path.join(self.directory, symbol + '.npy')
+
+    def load(self, symbol: str, mmap: bool = True) -> np.ndarray:
+        """Reads the stored bars
+
+        Args:
+            symbol (str): Symbol for asset
+            mmap (bool, optional): Memory map the file instead of reading it. Defaults to True.
+
+        Returns:
+            np.ndarray: Bars with 'date' and 'close' fields. None if nothing is stored.
+        """
+        if(not os.path.exists(self._path(symbol))): return
+        return np.load(self._path(symbol), mmap_mode='r' if mmap else None)
+
+    def _save(self, symbol: str, bars: np.ndarray) -> None:
+        """Atomically replaces the stored bars
+
+        Args:
+            symbol (str): Symbol for asset
+            bars (np.ndarray): Bars with 'date' and 'close' fields
+        """
+        tmp = self._path(symbol) + '.tmp.npy'
+        np.save(tmp, bars)
+        os.replace(tmp, self._path(symbol))
+        return
+
+    def _toBars(self, history: pd.DataFrame) -> np.ndarray:
+        """Converts provider output to the stored format
+
+        Args:
+            history (pd.DataFrame): 'Date' and 'Close' columns
+
+        Returns:
+            np.ndarray: Bars with 'date' and 'close' fields
+        """
+        bars = np.empty(len(history), dtype=BARS)
+        bars['date'] = pd.to_datetime(history['Date']).to_numpy().astype('datetime64[D]')
+        bars['close'] = history['Close'].to_numpy(dtype=float)
+        return bars
+
+    def update(self, symbol: str) -> np.ndarray:
+        """Fetches bars newer than the last stored date. The last stored bar is fetched again
+            and if it is missing or its close changed (a gap or an adjusted history) the full
+            history is downloaded instead.
+
+        Args:
+            symbol (str): Symbol for asset
+
+        Returns:
+            np.ndarray: All stored bars
+        """
+        stored = self.load(symbol, mmap=False)
+        if(stored is None or len(stored) == 0):
+            bars = self._toBars(self.provider.getPriceHistory(symbol))
+            self._save(symbol, bars)
+            return bars
+
+        last = stored[-1]
+        new = self._toBars(self.provider.getPriceHistory(symbol, pd.Timestamp(last['date']).strftime("%Y/%m/%d")))
+        overlap = new[new['date'] == last['date']]
+        if(len(overlap) == 0 or not np.isclose(overlap['close'][0], last['close'], rtol=1e-6, atol=0)):
+            bars = self._toBars(self.provider.getPriceHistory(symbol))
+        else:
+            bars = np.concatenate([stored, new[new['date'] > last['date']]])
+
+        if(len(bars) != len(stored) or not np.array_equal(bars, stored)): self._save(symbol, bars)
+        return bars
+
+    def getPriceHistory(self, symbol: str) -> pd.DataFrame:
+        """Brings a symbol up to date and returns the last years of closes
+
+        Args:
+            symbol (str): Symbol for asset
+
+        Returns:
+            pd.DataFrame: 'Date' and 'Close' columns, oldest first
+        """
+        bars = self.update(symbol)
+        cutoff = np.datetime64(datetime.now().date()) - np.timedelta64(365 * self.years + self.years // 4, 'D')
+        bars = bars[bars['date'] >= cutoff]
+        return pd.DataFrame({'Date': pd.to_datetime(bars['date']).strftime("%Y/%m/%d"), 'Close': bars['close']})
+
+class QuoteSnapshot:
+    """Last traded prices fetched with one batched quote request and kept for the
+        run until refresh is called
+    """
+    def __init__(self, TDSession: TDClient) -> None:
+        """Creates an empty snapshot
+
+        Args:
+            TDSession (TDClient): Authenticated API connection object
+        """
+        self.TDSession = TDSession
+        self.prices = {}
+        self.requests = 0
+        return
+
+    def _fetch(self, symbols: List[str]) -> None:
+        """Quotes symbols in a single request
+
+        Args:
+            symbols (List[str]): Symbols to quote
+        """
+        if(len(symbols) == 0): return
+        quotes = self.TDSession.get_quotes(symbols)
+        self.requests += 1
+        for symbol in symbols:
+            self.prices[symbol] = quotes[symbol]['lastPrice']
+        return
+
+    def prefetch(self, symbols: Iterable[str]) -> None:
+        """Quotes every symbol that is not in the snapshot yet
+
+        Args:
+            symbols (Iterable[str]): Symbols that will be needed
+        """
+        self._fetch(list(dict.fromkeys(x for x in symbols if x not in self.prices)))
+        return
+
+    def refresh(self, symbols: Iterable[str] = None) -> None:
+        """Quotes symbols again, eg: after trades have been placed
+
+        Args:
+            symbols (Iterable[str], optional): Symbols to quote. Defaults to every symbol in the snapshot.
+        """
+        symbols = list(self.prices) if symbols is None else list(dict.fromkeys(symbols))
+        self._fetch(symbols)
+        return
+
+    def getLastPrice(self, symbol: str) -> float:
+        """Gets most recent traded price for asset
+
+        Args:
+            symbol (str): Ticker
+
+        Returns:
+            float: Price in dollars
+        """
+        if(symbol not in self.prices): self._fetch([symbol])
+        return self.prices[symbol]
+
+def getQuoteSnapshot(TDSession: TDClient) -> QuoteSnapshot:
+    """Gets the snapshot shared by everything using an API session
+
+    Args:
+        TDSession (TDClient): Authenticated API connection object
+
+    Returns:
+        QuoteSnapshot: Snapshot for the session
+    """
+    if(TDSession not in _snapshots): _snapshots[TDSession] = QuoteSnapshot(TDSession)
+    return _snapshots[TDSession]
+
+def withBackoff(function: Callable, symbol: str, retries: int = 5, backoff: float = 0.5,
+                retryOn: Tuple[type] = (ExdLmtError,)):
+    """Calls function(symbol), retrying with exponential backoff and jitter when the
+        API reports that the request limit was exceeded
+
+    Args:
+        function (Callable): Function of a symbol
+        symbol (str): Symbol for asset
+        retries (int, optional): Attempts before giving up. Defaults to 5.
+        backoff (float, optional): Seconds to wait before the first retry. Defaults to 0.5.
+        retryOn (Tuple[type], optional): Exceptions that trigger a retry. Defaults to (ExdLmtError,).
+
+    Returns:
+        Output of function
+    """
+    for attempt in range(retries):
+        try:
+            return function(symbol)
+        except retryOn:
+            if(attempt == retries - 1): raise
+            sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+def fetchConcurrently(function: Callable, symbols: List[str], workers: int = 8, **kwargs) -> dict:
+    """Runs function for every symbol on a bounded thread pool
+
+    Args:
+        function (Callable): Function of a symbol, eg: Data.getPriceHistory
+        symbols (List[str]): Symbols to fetch
+        workers (int, optional): Maximum requests in flight. Defaults to 8.
+        **kwargs: Args to be passed to withBackoff
+
+    Returns:
+        dict: Symbol: output of function
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {symbol: pool.submit(withBackoff, function, symbol, **kwargs) for symbol in symbols}
+        return {symbol: future.result() for symbol, future in futures.items()}
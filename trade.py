@@ -16,18 +16,23 @@
 
 # Owner can be contacted via email: Shaurya [at] Tathgir [dot] com
 
+import argparse, os, tempfile
 from datetime import datetime
 from sys import exit
-from time import sleep
-from typing import List, Tuple
+from time import perf_counter
+from typing import Dict, List, Tuple
 from warnings import filterwarnings
 
 from td.client import TDClient
 
-from communicate import marketClosed, publish
+from broker import SimulatedBroker
+from communicate import marketClosed, orderIssue, publish
 from config import *
+from environment import Environment, SessionClock, liveEnvironment
 from helpers import *
-from Markowitz import EfficientFrontier
+from Markowitz import CovarianceAccumulator, EfficientFrontier, OptimizerCache
+from orders import FILLED, OrderResult
+from prices import LocalPriceProvider
 
 filterwarnings("ignore", category=RuntimeWarning)
 
@@ -55,44 +60,65 @@ def checkMarket(TDSession: TDClient) -> None:
         exit()
     return
 
-def getAssets(TDSession: TDClient) -> Tuple[List[RelativeRotation], List[Asset], List[Asset]]:
-    """Gets asset objects with data loaded
+def getAssets(TDSession: TDClient, stateDir: str = RR_STATE_DIR,
+              priceDir: str = PRICE_DIR) -> Tuple[List[RelativeRotation], List[Asset], List[Asset]]:
+    """Gets asset objects with data loaded. Relative rotation values are streamed from
+        the calculators saved in stateDir when it is set.
 
     Args:
         TDSession (TDClient): API object
+        stateDir (str, optional): Folder for the streaming calculator states. Defaults to RR_STATE_DIR.
+        priceDir (str, optional): Folder of the local price store. Defaults to PRICE_DIR.
 
     Returns:
         List[RelativeRotation]: All RelativeRotations to be used for RRG plot
         List[Asset]: Portfolio assets with data
         List[Asset]: All assets with data
     """
-    setup = SetupRR(TDSession)
+    setup = SetupRR(TDSession, stateDir=stateDir, priceDir=priceDir)
     rr = setup.getRR()
 
-    if(setup.getLastPrice(VOL_INDEX) < VOL_CUTOFF):
-        quadrants = LV_QUADRANTS
-    else:
-        quadrants = HV_QUADRANTS
-    
-    portfolio = [x for x in assets if quadrants[x.quadrant - 1]]
+    assets = [relRot.getAsset() for relRot in rr]
+    selected = volatilityMask(setup.getQuadrants()[:, -1], setup.getLastPrice(VOL_INDEX),
+                              VOL_CUTOFF, LV_QUADRANTS, HV_QUADRANTS)
+    portfolio = [x for x, include in zip(assets, selected) if include]
     return rr, portfolio, assets
 
-def optimizeWeights(portfolio: List[Asset], assets: List[Asset]) -> List[Asset]:
+def optimizeWeights(portfolio: List[Asset], assets: List[Asset], rfr: float = None,
+                    covariance: CovarianceAccumulator = None, cache: OptimizerCache = None,
+                    version = None, seed: int = None) -> List[Asset]:
     """Optimizes the weightings for included assets
 
     Args:
         portfolio (List[Asset]): Assets to be included
         assets (List[Asset]): List of all assets
+        rfr (float, optional): Risk free rate. Defaults to the latest from getRiskFreeRate.
+        covariance (CovarianceAccumulator, optional): Running covariance of all assets. Defaults to None,
+                                                       computed from the portfolio's prices.
+        cache (OptimizerCache, optional): Reuses weights of an identical selection. Defaults to None, no caching.
+        version (optional): Identifies the data the assets were built from, eg: backtest day. Required with cache.
+        seed (int, optional): Random seed of the 'Sharpe' method, so two runs draw the same portfolios. Defaults to None.
 
     Returns:
         List[Asset]: All assets with weights assigned in parameter
     """
-    optimizer = EfficientFrontier(portfolio)
-    match OPT_METHOD:
-        case 'Sharpe': optimizer.optimizeSharpeRatio()
-        case 'GlobalMinimumVariance': optimizer.globalMinimumVarianceWeights()
-    #   case 'RiskTolerance': optimizer.optimalPortfolioWeights(gamma)
-    portAssets = optimizer.assets
+    if(rfr is None): rfr = getRiskFreeRate()
+    key = None if cache is None else cache.key(version, portfolio, OPT_METHOD, rfr, NUM_PORTFOLIOS)
+    weights = None if cache is None else cache.get(key)
+    
+    if(weights is None):
+        optimizer = EfficientFrontier(portfolio, rfr, covariance)
+        match OPT_METHOD:
+            case 'Sharpe': optimizer.optimizeSharpeRatio(seed)
+            case 'SharpeQP': optimizer.optimizeSharpeQP()
+            case 'GlobalMinimumVariance': optimizer.globalMinimumVarianceWeights()
+        #   case 'RiskTolerance': optimizer.optimalPortfolioWeights(gamma)
+        portAssets = optimizer.assets
+        if(cache is not None): cache.put(key, {x.ticker: x.weight for x in portAssets})
+    else:
+        portAssets = portfolio
+        for x in portAssets:
+            x.weight = weights[x.ticker]
 
     excluded = [x for x in assets if x not in portfolio]
     for x in excluded:
@@ -100,48 +126,36 @@ def optimizeWeights(portfolio: List[Asset], assets: List[Asset]) -> List[Asset]:
 
     return portAssets + excluded
 
-def getCurrentPositions(TDSession: TDClient, book: PositionTracker) -> dict:
+def getCurrentPositions(env: Environment, book: PositionTracker) -> dict:
     """Gets current quantities for shares within the portfolio
 
     Args:
-        TDSession (TDClient): API object
+        env (Environment): Run environment, positions come from its venue
         book (PositionTracker): Tracking object
 
     Returns:
         dict: Symbol: quantity
     """
-    grabber = Data(TDSession)
-    tickers = grabber.getTickers()['tickers']
-    positions = list(book.positions.columns)
+    tickers = list(env.tickers)
+    positions = book.getColumns()
     for i in tickers + ['Date', 'Cash', 'Value', 'Benchmark']:
         if(i in positions): positions.remove(i)
     tickers += positions
     
-    holdings = TDSession.get_accounts(account = TD_ACCOUNT,
-                                      fields=['positions'])['securitiesAccount']['positions']
-    current = {}
-    for position in holdings:
-        if(position['instrument']['symbol'] in tickers):
-            current[position['instrument']['symbol']] = position['longQuantity']
-    
-    notHeld = [x for x in tickers if x not in current.keys()]
-    for position in notHeld:
-        current[position] = 0
-    
-    return current
+    return env.venue.getPositions(tickers)
 
-def calculatePositions(TDSession: TDClient, book: PositionTracker, assets: List[Asset]) -> dict:
+def calculatePositions(env: Environment, book: PositionTracker, assets: List[Asset]) -> dict:
     """Finds the number of shares that need to be bought/sold to reach new target allocation
 
     Args:
-        TDSession (TDClient): API object
+        env (Environment): Run environment
         book (PositionTracker): Position tracking object
         assets (List[Asset]): All assets in consideration
 
     Returns:
         dict: Symbol: trade quantity
     """
-    current = getCurrentPositions(TDSession, book)
+    current = getCurrentPositions(env, book)
     
     targetPositions = {}
     deltaPositions = {}
@@ -157,82 +171,45 @@ def calculatePositions(TDSession: TDClient, book: PositionTracker, assets: List[
 
     return deltaPositions
 
-def placeTrade(TDSession: TDClient, symbol: str, quantity: int) -> float:
-    """Places a trade
-
-    Args:
-        TDSession (TDClient): API object
-        symbol (str): Ticker for asset
-        quantity (int): Number of shares. Negative if sale. Must be non-zero.
-
-    Returns:
-        float: Execution price
-    """
-    if(quantity < 0):
-        instruction = "sell"
-        quantity *= -1
-    else:
-        instruction = "buy"
-    
-    quantity = int(quantity)
-    
-    order = {
-                "orderType": "MARKET",
-                "session": "NORMAL",
-                "duration": "DAY",
-                "orderStrategyType": "SINGLE",
-                "orderLegCollection": [
-                    {
-                        "instruction": instruction,
-                        "quantity": quantity,
-                        "instrument": {
-                            "symbol": symbol,
-                            "assetType": "EQUITY"
-                        }
-                    }
-                ]
-            }
-    resp = TDSession.place_order(account = TD_ACCOUNT, order = order)
-    
-    while TDSession.get_orders(account=TD_ACCOUNT,
-                               order_id = resp['order_id'])['remainingQuantity'] != 0:
-        sleep(1)
-    
-    execPrice = TDSession.get_orders(account=TD_ACCOUNT,
-                                     order_id = resp['order_id'])
-    execPrice = execPrice["orderActivityCollection"][0]["executionLegs"][0]["price"]
-    
-    return execPrice
-
-def rebalance(TDSession: TDClient, numShares: dict) -> dict:
-    """Rebalances the portfolio
+def rebalance(env: Environment, numShares: dict) -> Tuple[dict, dict, Dict[str, OrderResult]]:
+    """Rebalances the portfolio through the environment's venue. Live, sells are placed
+        before buys and fills are tracked concurrently, orders still open after the
+        timeout are cancelled.
 
     Args:
-        TDSession (TDClient): API object
+        env (Environment): Run environment
         numShares (dict): Size of trades that need to be made
 
     Returns:
-        dict: Symbol: execution price
+        dict: Symbol: filled quantity, negative if sale
+        dict: Symbol: average execution price
+        Dict[str, OrderResult]: Symbol: outcome of every order that was not completely filled
     """
+    results = env.venue.execute(numShares)
+    
+    filled = {}
     execPrice = {}
-    for symbol, quantity in numShares.items():
-        if(int(quantity) == 0):
+    issues = {}
+    for symbol, result in results.items():
+        if(result.status != FILLED):
+            issues[symbol] = result
+        if(result.filled == 0):
             continue
-        price = placeTrade(TDSession, symbol, quantity)
-        execPrice[symbol] = price
+        filled[symbol] = result.filled
+        execPrice[symbol] = result.price
     
-    return execPrice
+    return filled, execPrice, issues
 
-def logTrades(TDSession: TDClient, book: PositionTracker, quantity: dict, price: dict) -> None:
+def logTrades(env: Environment, book: PositionTracker, quantity: dict, price: dict) -> None:
     """Logs the trades in position tracker
 
     Args:
-        TDSession (TDClient): API object
+        env (Environment): Run environment
         book (PositionTracker): Position tracker
         quantity (dict): Size of trades
         price (dict): Execution price of trades
     """
-    today = datetime.now().strftime("%Y/%m/%d")
+    today = env.clock.today()
     deltaCash = 0
     
     for symbol, shares in quantity.items():
@@ -243,25 +220,25 @@ def logTrades(TDSession: TDClient, book: PositionTracker, quantity: dict, price:
         data = {'Date': today, 'Symbol': symbol, 'Quantity': shares, "Value": value}
         book.logTrade(data)
     
-    current = getCurrentPositions(TDSession, book)
+    current = getCurrentPositions(env, book)
     cash = book.getPreviousCashBalance() + deltaCash
     
-    grabber = Data(TDSession)
+    env.quotes.refresh(list(current) + [MARKET_INDEX])
     
     positionValues = {}
     for symbol, quantity in current.items():
-        positionValues[symbol] = quantity * grabber.getLastPrice(symbol)
+        positionValues[symbol] = quantity * env.quotes.getLastPrice(symbol)
     
     strategyValue = cash + sum(positionValues.values())
     
     book.addColumns()
     
     mult = book.getMarketMultiplier()
-    benchmarkValue = grabber.getLastPrice(MARKET_INDEX) * mult
+    benchmarkValue = env.quotes.getLastPrice(MARKET_INDEX) * mult
     
     value = {'Date': today, 'Cash': cash, 'Value': strategyValue, 'Benchmark': benchmarkValue}
     positions = {'Date': today, 'Cash': cash, 'Value': strategyValue, 'Benchmark': mult}
-    for column in book.tracker.columns:
+    for column in book.getColumns():
         if(column not in list(positionValues.keys()) + ['Date', 'Cash', 'Value', 'Benchmark']):
             value[column] = 0
             positions[column] = 0
@@ -277,13 +254,50 @@ def logTrades(TDSession: TDClient, book: PositionTracker, quantity: dict, price:
     return
 
 if __name__ == "__main__":
-    TDSession = authenticateAPI()
+    parser = argparse.ArgumentParser(description='Rebalance the portfolio')
+    parser.add_argument('--offline', default=None, help='Folder of <symbol>.csv daily closes, trade against a simulated broker instead of TD. '
+                                                        'Needs an existing RFR_CACHE, the rate is never downloaded offline')
+    parser.add_argument('--tickers', nargs='+', default=None, help='Offline watchlist, defaults to every csv except the market and volatility indices')
+    parser.add_argument('--date', default=None, help='Offline trading day eg: 2022/01/14, defaults to the last bar')
+    parser.add_argument('--latency', type=float, default=0, help='Offline seconds per request')
+    parser.add_argument('--fill-delay', type=float, default=0, help='Offline seconds before an order fills')
+    parser.add_argument('--fill-ratio', type=float, default=1, help='Offline part of each order that fills')
+    parser.add_argument('--ledger', default=None, help='Offline folder for the tracker files, defaults to a new temporary folder')
+    args = parser.parse_args()
+    
+    start = perf_counter()
+    if(args.offline is None):
+        TDSession = authenticateAPI()
+        stateDir = RR_STATE_DIR
+        priceDir = PRICE_DIR
+        clock = None
+        rfr = None
+    else:
+        if(not RFR_CACHE or not os.path.exists(RFR_CACHE)):
+            parser.error('--offline reads the risk free rate from RFR_CACHE (%s), run once online to create it' % RFR_CACHE)
+        # Simulated bars must not reach the live price store or calculator states and the rate is read from the local cache only
+        priceDir = None
+        tickers = args.tickers or sorted(x[:-4] for x in os.listdir(args.offline)
+                                         if x.endswith('.csv') and x[:-4] not in [MARKET_INDEX, VOL_INDEX])
+        TDSession = SimulatedBroker(LocalPriceProvider(args.offline), tickers, args.date, latency=args.latency,
+                                    fillDelay=args.fill_delay, fillRatio=args.fill_ratio)
+        args.ledger = args.ledger or tempfile.mkdtemp()
+        stateDir = os.path.join(args.ledger, 'rotation')
+        clock = SessionClock(TDSession.getDate(MARKET_INDEX))
+        rfr = RiskFreeRate(offline=True).getRate(clock.today())
+    
     checkMarket(TDSession)
-    rr, portfolio, assets = getAssets(TDSession)
-    assets = optimizeWeights(portfolio, assets)
-    book = PositionTracker(TDSession)
-    deltaPositions = calculatePositions(TDSession, book, assets)
-    price = rebalance(TDSession, deltaPositions)
-    logTrades(TDSession, book, deltaPositions, price)
-    publish(book, rr)
-    book.saveLogs()
\ No newline at end of file
+    rr, portfolio, assets = getAssets(TDSession, stateDir, priceDir)
+    assets = optimizeWeights(portfolio, assets, rfr)
+    env = liveEnvironment(TDSession, args.ledger, clock)
+    book = PositionTracker(env)
+    if(args.offline is not None): TDSession.setAccount(book.holdings, book.getPreviousCashBalance())
+    deltaPositions = calculatePositions(env, book, assets)
+    filled, price, issues = rebalance(env, deltaPositions)
+    logTrades(env, book, filled, price)
+    if(args.offline is None): publish(book, rr, issues)
+    book.saveLogs()
+    
+    if(args.offline is not None):
+        for result in issues.values(): print(orderIssue(result))
+        print('Rebalanced in %.3fs with %d requests, files in %s' % (perf_counter() - start, TDSession.requests, args.ledger))